@@ -0,0 +1,102 @@
+"""
+generators.py
+
+Seeded generators of synthetic networks for benchmarking. Each returns
+the vertex count and an edge list of (first, second, weight) tuples in
+the form WeightedDiGraph takes, so that construction can be timed too.
+Weights are travel times in seconds.
+"""
+
+import math
+import random
+
+
+def grid_graph(n_vertices, seed=0, min_weight=30, max_weight=120):
+    """ A road-like square grid of about n_vertices vertices with edges
+        both ways between horizontal and vertical neighbours """
+    rng = random.Random(seed)
+    side = max(1, int(round(math.sqrt(n_vertices))))
+    edges = []
+    for row in xrange(side):
+        for column in xrange(side):
+            u_id = row * side + column
+            neighbours = []
+            if column + 1 < side:
+                neighbours.append(u_id + 1)
+            if row + 1 < side:
+                neighbours.append(u_id + side)
+            for v_id in neighbours:
+                weight = rng.randint(min_weight, max_weight)
+                edges.append((u_id, v_id, weight))
+                edges.append((v_id, u_id, weight))
+
+    return side * side, edges
+
+
+def random_geometric_graph(n_vertices, seed=0, mean_degree=6, speed=10.0,
+                           side_length=20000.0):
+    """ A transit-like graph of n_vertices stops scattered over a square
+        of side_length metres, each joined both ways to the stops within
+        the radius that gives about mean_degree neighbours, with weights
+        of the distance over speed (metres per second) """
+    rng = random.Random(seed)
+    points = [(rng.uniform(0, side_length), rng.uniform(0, side_length))
+              for _ in xrange(n_vertices)]
+    radius = side_length * math.sqrt(mean_degree / (math.pi * max(n_vertices, 1)))
+
+    # bucket the points into cells of the radius so that only the
+    # neighbouring cells need to be compared
+    cells = {}
+    for vertex_id, (x, y) in enumerate(points):
+        cells.setdefault((int(x // radius), int(y // radius)), []).append(vertex_id)
+
+    edges = []
+    for (cell_x, cell_y), members in cells.iteritems():
+        for offset_x in (-1, 0, 1):
+            for offset_y in (-1, 0, 1):
+                others = cells.get((cell_x + offset_x, cell_y + offset_y), ())
+                for u_id in members:
+                    u_x, u_y = points[u_id]
+                    for v_id in others:
+                        if v_id <= u_id:
+                            continue
+                        distance = math.hypot(points[v_id][0] - u_x,
+                                              points[v_id][1] - u_y)
+                        if distance <= radius:
+                            weight = max(1, int(round(distance / speed)))
+                            edges.append((u_id, v_id, weight))
+                            edges.append((v_id, u_id, weight))
+
+    return n_vertices, edges
+
+
+def scale_free_graph(n_vertices, seed=0, edges_per_vertex=3, min_weight=1,
+                     max_weight=600):
+    """ A scale-free graph grown by preferential attachment
+        (Barabasi-Albert): each new vertex joins, both ways, to
+        edges_per_vertex existing vertices picked in proportion to
+        their degree """
+    rng = random.Random(seed)
+    # every vertex appears here once per edge end, so a uniform pick
+    # from it is a pick in proportion to degree
+    ends = range(min(edges_per_vertex, n_vertices))
+    edges = []
+    for u_id in xrange(len(ends), n_vertices):
+        chosen = set()
+        while len(chosen) < min(edges_per_vertex, u_id):
+            chosen.add(rng.choice(ends))
+        for v_id in chosen:
+            weight = rng.randint(min_weight, max_weight)
+            edges.append((u_id, v_id, weight))
+            edges.append((v_id, u_id, weight))
+            ends.append(v_id)
+            ends.append(u_id)
+
+    return n_vertices, edges
+
+
+GENERATORS = {
+    "grid": grid_graph,
+    "geometric": random_geometric_graph,
+    "scale_free": scale_free_graph,
+    }
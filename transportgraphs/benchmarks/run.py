@@ -0,0 +1,144 @@
+"""
+run.py
+
+Times WeightedDiGraph construction, dijikstra, bellman_ford and
+create_path_from_graph on synthetic networks and writes the results as
+JSON, so that runs against different versions can be compared. Run from
+the transportgraphs directory, e.g.
+
+    python -m benchmarks.run --sizes 1000 10000 --output results.json
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import timeit
+from benchmarks.generators import GENERATORS
+from graphs.graphs import WeightedDiGraph
+from graphs.graphs import bellman_ford
+from graphs.graphs import create_path_from_graph
+from graphs.graphs import dijikstra
+from graphs.graphs import PATH_COST
+
+RESULTS_FORMAT = 1
+
+
+def summarise(timings):
+    """ Summary statistics, in seconds, of a list of timings """
+    ordered = sorted(timings)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        median = ordered[middle]
+    else:
+        median = (ordered[middle - 1] + ordered[middle]) / 2.0
+    return {
+        "runs": len(ordered),
+        "min": ordered[0],
+        "median": median,
+        "mean": sum(ordered) / len(ordered),
+        }
+
+
+def timed(function, *args):
+    """ Calls function(*args), returning its result and the seconds
+        it took """
+    start = timeit.default_timer()
+    result = function(*args)
+    return result, timeit.default_timer() - start
+
+
+def benchmark_network(generator, n_vertices, seed, queries,
+                      bellman_ford_limit):
+    """ Times the graph operations on one generated network. Sources for
+        the searches are picked with the same seed. bellman_ford is only
+        timed on networks of at most bellman_ford_limit vertices. """
+    n_vertices, edges = GENERATORS[generator](n_vertices, seed)
+    graph, construction = timed(WeightedDiGraph, n_vertices, edges)
+
+    rng = random.Random(seed)
+    sources = [rng.randrange(n_vertices) for _ in xrange(queries)]
+    search_timings = []
+    path_timings = []
+    for source in sources:
+        _, seconds = timed(dijikstra, graph, source)
+        search_timings.append(seconds)
+
+        reached = [vertex_id for vertex_id in xrange(n_vertices)
+                   if graph.get_vertex_value(vertex_id, PATH_COST) < float("+inf")]
+        target = rng.choice(reached)
+        _, seconds = timed(create_path_from_graph, graph, source, target)
+        path_timings.append(seconds)
+
+    result = {
+        "generator": generator,
+        "seed": seed,
+        "vertices": n_vertices,
+        "edges": graph.get_edge_count(),
+        "construction": summarise([construction]),
+        "dijikstra": summarise(search_timings),
+        "create_path_from_graph": summarise(path_timings),
+        "bellman_ford": None,
+        }
+
+    if n_vertices <= bellman_ford_limit:
+        timings = [timed(bellman_ford, graph, source)[1] for source in sources]
+        result["bellman_ford"] = summarise(timings)
+
+    return result
+
+
+def run_benchmarks(generators, sizes, seed=0, queries=5,
+                   bellman_ford_limit=10000):
+    """ Benchmarks every generator at every size, returning a dict of
+        metadata and per-network results ready to write as JSON """
+    results = []
+    for generator in generators:
+        for size in sizes:
+            results.append(benchmark_network(
+                generator, size, seed, queries, bellman_ford_limit))
+
+    return {
+        "format": RESULTS_FORMAT,
+        "created": datetime.datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "queries": queries,
+        "results": results,
+        }
+
+
+def main(argv=None):
+    """ Command line entry point """
+    parser = argparse.ArgumentParser(
+        description="Times graph construction, searches and path building "
+                    "on synthetic networks and writes the results as JSON.")
+    parser.add_argument("--generators", nargs="+", choices=sorted(GENERATORS),
+                        default=sorted(GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int,
+                        default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=5,
+                        help="searches timed per network")
+    parser.add_argument("--bellman-ford-limit", type=int, default=10000,
+                        help="largest network to time bellman_ford on")
+    parser.add_argument("--output", help="file to write, default stdout")
+    arguments = parser.parse_args(argv)
+
+    report = run_benchmarks(arguments.generators, arguments.sizes,
+                            arguments.seed, arguments.queries,
+                            arguments.bellman_ford_limit)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as the_file:
+            json.dump(report, the_file, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+cache.py
+
+Caches shortest path trees so that repeated queries from the same
+source vertex skip the search.
+"""
+
+import sys
+from collections import OrderedDict
+from graphs import create_path_from_graph
+from graphs import dijkstra_search
+
+# rough size of the number object behind each reached vertex's cost
+COST_OBJECT_SIZE = 24
+
+
+def estimated_size(context):
+    """ Rough size in bytes of the state held in a SearchContext """
+    size = sys.getsizeof(context.distances) + sys.getsizeof(context.predecessors)
+    return size + COST_OBJECT_SIZE * len(context.reached_vertices())
+
+
+class ShortestPathCache(object):
+    """ Least recently used cache of complete shortest path trees (the
+        SearchContext of a search without a target) keyed by source
+        vertex. Holds at most max_entries trees and, if max_bytes is
+        given, at most about that many bytes of them. The trees are
+        dropped whenever the version stamp of the graph changes.
+        search is the algorithm used on a miss; it is called as
+        search(graph, source) and must return a SearchContext.
+        Contexts handed out belong to the cache and must not be
+        modified. """
+
+    def __init__(self, graph, max_entries=16, max_bytes=None,
+                 search=dijkstra_search):
+        self.graph = graph
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.search = search
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.version = graph.version
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, source):
+        return self.version == self.graph.version and source in self.entries
+
+    def clear(self):
+        """ drops every cached tree """
+        self.entries.clear()
+        self.total_bytes = 0
+        self.version = self.graph.version
+
+    def get_tree(self, source):
+        """ returns the SearchContext of a complete search from source,
+            searching only if it is not cached """
+        if self.version != self.graph.version:
+            self.clear()
+
+        entry = self.entries.pop(source, None)
+        if entry is not None:
+            self.hits += 1
+            self.entries[source] = entry
+            return entry[0]
+
+        self.misses += 1
+        context = self.search(self.graph, source)
+        size = estimated_size(context)
+        if self.max_bytes is None or size <= self.max_bytes:
+            self.entries[source] = (context, size)
+            self.total_bytes += size
+            self._evict()
+
+        return context
+
+    def _evict(self):
+        """ drops least recently used trees until within both limits """
+        while (len(self.entries) > self.max_entries or
+               (self.max_bytes is not None and
+                self.total_bytes > self.max_bytes)):
+            _, (_, size) = self.entries.popitem(last=False)
+            self.total_bytes -= size
+
+    def get_cost(self, source, target):
+        """ returns the shortest path cost from source to target """
+        return self.get_tree(source).get_cost(target)
+
+    def get_path(self, source, target):
+        """ returns the shortest Path from source to target, raising
+            ValueError if target is not reachable """
+        return create_path_from_graph(
+            self.graph, source, target, self.get_tree(source))
@@ -0,0 +1,288 @@
+"""
+contraction.py
+
+Contraction hierarchies: a preprocessing step over a WeightedDiGraph that
+ranks the vertices and adds shortcut edges, after which point-to-point
+queries only have to search upwards in rank from either end.
+"""
+
+import heapq
+import struct
+import sys
+from array import array
+from graphs import CompressedAdjacency
+from graphs import INFINITY
+from graphs import Path
+from graphs import SearchContext
+from storage import BIG_ENDIAN
+from storage import read_array
+from storage import write_array
+
+# vertices settled by a witness search before it gives up. Giving up
+# early only ever adds shortcuts that were not needed.
+WITNESS_SETTLE_LIMIT = 500
+
+FILE_MAGIC = "TGCH"
+FILE_VERSION = 2
+HEADER = struct.Struct("<4sII")
+
+
+def _witness_distances(out_edges, source, excluded, max_cost):
+    """ Local Dijkstra from source that never passes through excluded
+        and stops beyond max_cost or WITNESS_SETTLE_LIMIT settled
+        vertices. Returns a dict of upper bounds on the path costs. """
+    distances = {source: 0}
+    heap = [(0, source)]
+    settled = 0
+    while heap:
+        cost, u_id = heapq.heappop(heap)
+        if cost > distances[u_id]:
+            continue
+        if cost > max_cost or settled >= WITNESS_SETTLE_LIMIT:
+            break
+        settled += 1
+        for v_id, weight in out_edges[u_id].iteritems():
+            if v_id == excluded:
+                continue
+            new_cost = cost + weight
+            if new_cost < distances.get(v_id, INFINITY):
+                distances[v_id] = new_cost
+                heapq.heappush(heap, (new_cost, v_id))
+
+    return distances
+
+
+def _needed_shortcuts(out_edges, in_edges, vertex_id):
+    """ Returns the (first, second, weight) shortcuts needed to keep
+        path costs between the neighbours of vertex_id when it is
+        removed from the graph """
+    outgoing = out_edges[vertex_id]
+    incoming = in_edges[vertex_id]
+    if not outgoing or not incoming:
+        return []
+
+    max_outgoing = max(outgoing.itervalues())
+    shortcuts = []
+    for u_id, u_weight in incoming.iteritems():
+        witness = _witness_distances(
+            out_edges, u_id, vertex_id, u_weight + max_outgoing)
+        for w_id, w_weight in outgoing.iteritems():
+            if w_id == u_id:
+                continue
+            via = u_weight + w_weight
+            if witness.get(w_id, INFINITY) > via:
+                shortcuts.append((u_id, w_id, via))
+
+    return shortcuts
+
+
+def _build_adjacency(n_vertices, edges, typecode):
+    """ Builds a CompressedAdjacency from (first, second, weight, middle)
+        tuples, returning it along with an array of the middle vertex of
+        each stored edge (-1 for original edges) """
+    rows = array('l', (edge[0] for edge in edges))
+    columns = array('l', (edge[1] for edge in edges))
+    indices = array('l', xrange(len(edges)))
+    by_index = CompressedAdjacency.from_columns(
+        n_vertices, rows, columns, indices, 'l')
+
+    weights = array(typecode, (edges[i][2] for i in by_index.weights))
+    middles = array('l', (edges[i][3] for i in by_index.weights))
+    adjacency = CompressedAdjacency(by_index.offsets, by_index.targets, weights)
+    return adjacency, middles
+
+
+class ContractionHierarchy(object):
+    """ A graph ranked by contraction order. The upward graph holds each
+        edge (u, v) with rank[u] < rank[v]; the downward graph holds each
+        edge (u, v) with rank[u] > rank[v], stored reversed as (v, u) so
+        that a backward search also only moves up in rank. Shortcut edges
+        carry the vertex they bypass in the matching middles array. """
+
+    def __init__(self, ranks, up, up_middles, down, down_middles):
+        self.vertex_count = len(ranks)
+        self.ranks = ranks
+        self.up = up
+        self.up_middles = up_middles
+        self.down = down
+        self.down_middles = down_middles
+
+    @classmethod
+    def build(cls, graph):
+        """ Contracts the vertices of a WeightedDiGraph one at a time,
+            cheapest first by edge difference plus the number of
+            neighbours already contracted, inserting the shortcuts that
+            keep path costs between the remaining vertices. """
+        n_vertices = graph.vertex_count
+        out_edges = [{} for _ in xrange(n_vertices)]
+        in_edges = [{} for _ in xrange(n_vertices)]
+        for u_id, v_id, weight in graph.adjacency.iter_edges():
+            if u_id != v_id:
+                out_edges[u_id][v_id] = weight
+                in_edges[v_id][u_id] = weight
+
+        middles = {}
+        contracted_neighbours = [0] * n_vertices
+
+        def priority(vertex_id):
+            return (len(_needed_shortcuts(out_edges, in_edges, vertex_id)) -
+                    len(out_edges[vertex_id]) - len(in_edges[vertex_id]) +
+                    contracted_neighbours[vertex_id])
+
+        queue = [(priority(v_id), v_id) for v_id in xrange(n_vertices)]
+        heapq.heapify(queue)
+
+        ranks = array('l', [0]) * n_vertices
+        up_edges = []
+        down_edges = []
+        rank = 0
+        while queue:
+            _, v_id = heapq.heappop(queue)
+            # lazy update: re-queue if the vertex got more expensive
+            current = priority(v_id)
+            if queue and current > queue[0][0]:
+                heapq.heappush(queue, (current, v_id))
+                continue
+
+            for u_id, w_id, weight in _needed_shortcuts(
+                    out_edges, in_edges, v_id):
+                if weight < out_edges[u_id].get(w_id, INFINITY):
+                    out_edges[u_id][w_id] = weight
+                    in_edges[w_id][u_id] = weight
+                    middles[(u_id, w_id)] = v_id
+
+            for w_id, weight in out_edges[v_id].iteritems():
+                up_edges.append((v_id, w_id, weight, middles.get((v_id, w_id), -1)))
+                del in_edges[w_id][v_id]
+                contracted_neighbours[w_id] += 1
+            for u_id, weight in in_edges[v_id].iteritems():
+                down_edges.append((v_id, u_id, weight, middles.get((u_id, v_id), -1)))
+                del out_edges[u_id][v_id]
+                contracted_neighbours[u_id] += 1
+            out_edges[v_id] = {}
+            in_edges[v_id] = {}
+
+            ranks[v_id] = rank
+            rank += 1
+
+        typecode = graph.adjacency.weights.typecode
+        up, up_middles = _build_adjacency(n_vertices, up_edges, typecode)
+        down, down_middles = _build_adjacency(n_vertices, down_edges, typecode)
+        return cls(ranks, up, up_middles, down, down_middles)
+
+    def _middle(self, first, second):
+        """ returns the vertex bypassed by the edge (first, second),
+            or -1 if it is an original edge """
+        if self.ranks[first] < self.ranks[second]:
+            return self.up_middles[self.up.find(first, second)]
+        return self.down_middles[self.down.find(second, first)]
+
+    def _unpack(self, path):
+        """ expands the shortcuts on a path of hierarchy edges into
+            the original vertices they bypass """
+        result = [path[0]]
+        for i in xrange(len(path) - 1):
+            stack = [(path[i], path[i + 1])]
+            while stack:
+                first, second = stack.pop()
+                middle = self._middle(first, second)
+                if middle < 0:
+                    result.append(second)
+                else:
+                    stack.append((middle, second))
+                    stack.append((first, middle))
+
+        return result
+
+    def query(self, source, target):
+        """ Shortest path from source to target by a bidirectional search
+            that only follows edges upwards in rank. Returns a Path of
+            original vertex ids, or raises ValueError if target is not
+            reachable from source. """
+        if source == target:
+            return Path((source,), 0)
+
+        forward = SearchContext()
+        forward.reset(source)
+        backward = SearchContext()
+        backward.reset(target)
+        sides = [
+            ([(0, source)], self.up, forward, backward),
+            ([(0, target)], self.down, backward, forward)
+            ]
+
+        best = INFINITY
+        meeting = None
+        while True:
+            # each side stops once its frontier reaches the best cost
+            live = [side for side in sides if side[0] and side[0][0][0] < best]
+            if not live:
+                break
+            heap, adjacency, this_side, other_side = min(
+                live, key=lambda side: side[0][0][0])
+
+            cost, u_id = heapq.heappop(heap)
+            if cost > this_side.distances[u_id]:
+                continue
+            for i in xrange(adjacency.offsets[u_id], adjacency.offsets[u_id + 1]):
+                v_id = adjacency.targets[i]
+                new_cost = cost + adjacency.weights[i]
+                if new_cost < this_side.distances[v_id]:
+                    this_side.update(v_id, new_cost, u_id)
+                    heapq.heappush(heap, (new_cost, v_id))
+                    through_v = new_cost + other_side.distances[v_id]
+                    if through_v < best:
+                        best = through_v
+                        meeting = v_id
+
+        if meeting is None:
+            raise ValueError("{0} is not reachable from {1}".format(target, source))
+
+        path = []
+        current = meeting
+        while current is not None:
+            path.append(current)
+            current = forward.get_predecessor(current)
+        path.reverse()
+        current = backward.get_predecessor(meeting)
+        while current is not None:
+            path.append(current)
+            current = backward.get_predecessor(current)
+
+        return Path(self._unpack(path), best)
+
+    def save(self, path):
+        """ Writes the hierarchy to a binary file. Arrays are written
+            in native byte order, which is recorded in the header. """
+        flags = BIG_ENDIAN if sys.byteorder == "big" else 0
+        with open(path, 'wb') as the_file:
+            the_file.write(HEADER.pack(FILE_MAGIC, FILE_VERSION, flags))
+            for values in (self.ranks,
+                           self.up.offsets, self.up.targets,
+                           self.up.weights, self.up_middles,
+                           self.down.offsets, self.down.targets,
+                           self.down.weights, self.down_middles):
+                write_array(the_file, values)
+
+    @classmethod
+    def load(cls, path):
+        """ Reads a hierarchy written by save. Raises ValueError if the
+            file is not one, or was written with the other byte order. """
+        with open(path, 'rb') as the_file:
+            header = the_file.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError(
+                    "{0} is not a contraction hierarchy file".format(path))
+            magic, version, flags = HEADER.unpack(header)
+            if magic != FILE_MAGIC or version != FILE_VERSION:
+                raise ValueError(
+                    "{0} is not a contraction hierarchy file".format(path))
+            if bool(flags & BIG_ENDIAN) != (sys.byteorder == "big"):
+                raise ValueError("{0} was written with the other byte "
+                                 "order".format(path))
+            arrays = [read_array(the_file) for _ in xrange(9)]
+
+        ranks = arrays[0]
+        up = CompressedAdjacency(*arrays[1:4])
+        down = CompressedAdjacency(*arrays[5:8])
+        return cls(ranks, up, arrays[4], down, arrays[8])
@@ -5,9 +5,15 @@ A simple graph library in python
 """
 
 import heapq
+from collections import deque
+from array import array
+from bisect import bisect_left
+from timeit import default_timer
+from heuristics import HaversineHeuristic
 
 PATH_COST = "d"
 PREDECESSOR = "p"
+INFINITY = float("+inf")
 
 class Node(object):
     """ Represents a node in a graph """
@@ -66,16 +72,28 @@ class Edge(object):
             self.get_first_vertex(), self.get_second_vertex(), self.weight)
 
 
-def create_path_from_graph(graph, start, end):
+def create_path_from_graph(graph, start, end, context=None):
     """ given a graph, start and end vertex, this creates a path object
-        implied by that graph """
-    cost = graph.get_vertex_value(end, PATH_COST)
+        implied by that graph. If a SearchContext is given the path is
+        read from it instead of the vertex workspaces. Raises ValueError
+        if end was not reached from start. """
+    if context is None:
+        cost = graph.get_vertex_value(end, PATH_COST)
+        predecessor = lambda vertex_id: graph.get_vertex_value(
+            vertex_id, PREDECESSOR)
+    else:
+        cost = context.get_cost(end)
+        predecessor = context.get_predecessor
+
+    if cost is None or cost == INFINITY:
+        raise ValueError("{0} is not reachable from {1}".format(end, start))
+
     reverse_path = []
 
     current = end
     while current != start:
         reverse_path.append(current)
-        current = graph.get_vertex_value(current, PREDECESSOR)
+        current = predecessor(current)
     reverse_path.append(start)
 
     reverse_path.reverse()
@@ -98,23 +116,251 @@ class Path(object):
     def __str__(self):
         return "cost: {0} path: {1}".format(self.cost, self.path)
 
+def _weight_typecode(weights):
+    """ Chooses an array typecode for a list of edge weights. Integer
+        weights are kept as integers so path costs keep their type. """
+    for weight in weights:
+        if not isinstance(weight, (int, long)):
+            return 'd'
+    return 'l'
+
+
+def _edge_columns(n_vertices, edge_list):
+    """ Splits an iterable of (first, second, weight) tuples into arrays
+        of first vertices, second vertices and weights. Returns those
+        along with the typecode of the weights array. """
+    rows = array('l')
+    columns = array('l')
+    weights = []
+    for edge in edge_list:
+        first, second = edge[0], edge[1]
+        if not (0 <= first < n_vertices and 0 <= second < n_vertices):
+            raise ValueError("{0} is not an edge between vertices "
+                             "0 and {1}".format(edge, n_vertices - 1))
+        rows.append(first)
+        columns.append(second)
+        weights.append(edge[2])
+
+    typecode = _weight_typecode(weights)
+    return rows, columns, array(typecode, weights), typecode
+
+
+class CompressedAdjacency(object):
+    """ Compressed sparse row (CSR) adjacency structure. The neighbours of
+        vertex u are targets[offsets[u]:offsets[u + 1]], sorted by id, with
+        the matching edge weights at the same positions in weights. """
+
+    def __init__(self, offsets, targets, weights):
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+
+    @classmethod
+    def from_columns(cls, n_vertices, rows, columns, weights, typecode):
+        """ Builds the structure from parallel arrays of row ids, column ids
+            and weights with a single counting sort on the row ids. If an
+            edge appears more than once the last occurrence wins. """
+        n_edges = len(rows)
+        starts = array('l', [0]) * (n_vertices + 1)
+        for row in rows:
+            starts[row + 1] += 1
+        for i in xrange(n_vertices):
+            starts[i + 1] += starts[i]
+
+        # stable placement of edge indices into their rows
+        cursor = array('l', starts)
+        order = array('l', [0]) * n_edges
+        for i in xrange(n_edges):
+            row = rows[i]
+            order[cursor[row]] = i
+            cursor[row] += 1
+
+        offsets = array('l', [0]) * (n_vertices + 1)
+        targets = array('l')
+        out_weights = array(typecode)
+        for u in xrange(n_vertices):
+            row_edges = order[starts[u]:starts[u + 1]]
+            if len(row_edges) > 1:
+                row_edges = sorted(row_edges, key=columns.__getitem__)
+            last = None
+            for i in row_edges:
+                v = columns[i]
+                if v == last:
+                    out_weights[-1] = weights[i]
+                else:
+                    targets.append(v)
+                    out_weights.append(weights[i])
+                    last = v
+            offsets[u + 1] = len(targets)
+
+        return cls(offsets, targets, out_weights)
+
+    @classmethod
+    def from_edges(cls, n_vertices, edge_list):
+        """ Builds the structure from an iterable of
+            (first, second, weight) tuples """
+        rows, columns, weights, typecode = _edge_columns(n_vertices, edge_list)
+        return cls.from_columns(n_vertices, rows, columns, weights, typecode)
+
+    def edge_count(self):
+        """ returns the number of edges stored """
+        return len(self.targets)
+
+    def degree(self, node_id):
+        """ returns the number of edges in the row of node_id """
+        return self.offsets[node_id + 1] - self.offsets[node_id]
+
+    def neighbour_ids(self, node_id):
+        """ returns the ids in the row of node_id """
+        return self.targets[self.offsets[node_id]:self.offsets[node_id + 1]]
+
+    def find(self, first, second):
+        """ returns the position of the edge (first, second) in
+            targets/weights, or -1 if there is no such edge """
+        start = self.offsets[first]
+        end = self.offsets[first + 1]
+        i = bisect_left(self.targets, second, start, end)
+        if i < end and self.targets[i] == second:
+            return i
+        return -1
+
+    def iter_edges(self):
+        """ yields every edge as a (first, second, weight) tuple """
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        for u in xrange(len(offsets) - 1):
+            for i in xrange(offsets[u], offsets[u + 1]):
+                yield u, targets[i], weights[i]
+
+    def _store_weight(self, i, weight):
+        """ stores a weight at position i, moving integer weights to a
+            float array first if the new weight is not an integer """
+        if self.weights.typecode == 'l' and not isinstance(weight, (int, long)):
+            self.weights = array('d', self.weights)
+        self.weights[i] = weight
+
+    def set_weight(self, first, second, weight):
+        """ sets the weight of the existing edge (first, second) """
+        i = self.find(first, second)
+        if i < 0:
+            raise ValueError("({0}, {1}) is not an edge".format(first, second))
+        self._store_weight(i, weight)
+
+    def insert(self, first, second, weight):
+        """ adds the edge (first, second), or sets its weight if it
+            exists. Moves every later row along, so O(V + E). """
+        i = self.find(first, second)
+        if i >= 0:
+            self._store_weight(i, weight)
+            return
+
+        i = bisect_left(self.targets, second,
+                        self.offsets[first], self.offsets[first + 1])
+        self.targets.insert(i, second)
+        self.weights.insert(i, 0)
+        self._store_weight(i, weight)
+        for u in xrange(first + 1, len(self.offsets)):
+            self.offsets[u] += 1
+
+    def remove(self, first, second):
+        """ removes the edge (first, second). Moves every later row
+            along, so O(V + E). """
+        i = self.find(first, second)
+        if i < 0:
+            raise ValueError("({0}, {1}) is not an edge".format(first, second))
+        self.targets.pop(i)
+        self.weights.pop(i)
+        for u in xrange(first + 1, len(self.offsets)):
+            self.offsets[u] -= 1
+
+
 class WeightedDiGraph(object):
-    """ Class representing a weighted directed graph """
+    """ Class representing a weighted directed graph. Edges are held in a
+        CompressedAdjacency; Edge objects are only created on request.
+        Unless reverse_index is False a second CompressedAdjacency keyed
+        on the second vertex of each edge is kept for incoming edges.
+        version is a stamp that changes whenever the edges do, so that
+        results computed on the graph can be recognised as stale.
+        vertex_ids optionally gives an external id (e.g. a stop_id) for
+        each vertex, in vertex order. """
+
+    def __init__(self, n_vertices, edge_list, reverse_index=True,
+                 vertex_ids=None):
+        rows, columns, weights, typecode = _edge_columns(n_vertices, edge_list)
+        adjacency = CompressedAdjacency.from_columns(
+            n_vertices, rows, columns, weights, typecode)
+        reverse_adjacency = None
+        if reverse_index:
+            reverse_adjacency = CompressedAdjacency.from_columns(
+                n_vertices, columns, rows, weights, typecode)
 
-    def __init__(self, n_vertices, edge_list):
+        self._attach(n_vertices, adjacency, reverse_adjacency, vertex_ids)
+
+    def _attach(self, n_vertices, adjacency, reverse_adjacency, vertex_ids):
+        """ sets up the graph over the given adjacency structures """
         self.vertex_count = n_vertices
-        self.vertices = {i:Node(i) for i in range(n_vertices)}
-        self.graph = {
-            key: {
-                edge[1]:
-                    Edge(
-                        edge[0],
-                        edge[1],
-                        edge[2])
-                    for edge in edge_list if edge[0] == key
-                }
-                for key in xrange(n_vertices)
-            }
+        self.version = 0
+        self.read_only = False
+        self.vertex_ids = vertex_ids
+        self.adjacency = adjacency
+        self.reverse_adjacency = reverse_adjacency
+        self._vertices = None
+
+    @classmethod
+    def from_adjacency(cls, adjacency, reverse_adjacency=None,
+                       vertex_ids=None):
+        """ Creates a graph over existing CompressedAdjacency structures
+            without rebuilding them """
+        graph = cls.__new__(cls)
+        graph._attach(len(adjacency.offsets) - 1, adjacency,
+                      reverse_adjacency, vertex_ids)
+        return graph
+
+    @property
+    def vertices(self):
+        """ dictionary mapping vertex ids to Node objects, created
+            the first time it is needed """
+        if self._vertices is None:
+            self._vertices = {i:Node(i) for i in xrange(self.vertex_count)}
+        return self._vertices
+
+    def has_reverse_index(self):
+        """ true if incoming edges are indexed """
+        return self.reverse_adjacency is not None
+
+    def _check_vertices(self, first, second):
+        """ raises ValueError unless the graph can be changed and both
+            vertices are in it """
+        if self.read_only:
+            raise ValueError("the graph is read-only")
+        if not (0 <= first < self.vertex_count and
+                0 <= second < self.vertex_count):
+            raise ValueError("({0}, {1}) is not an edge between vertices "
+                             "0 and {2}".format(first, second,
+                                                self.vertex_count - 1))
+
+    def update_edge_weight(self, first, second, weight):
+        """ changes the weight of an existing edge. O(log degree) """
+        self._check_vertices(first, second)
+        self.adjacency.set_weight(first, second, weight)
+        if self.reverse_adjacency is not None:
+            self.reverse_adjacency.set_weight(second, first, weight)
+        self.version += 1
+
+    def add_edge(self, first, second, weight):
+        """ adds an edge, or changes its weight if it exists. O(V + E) """
+        self._check_vertices(first, second)
+        self.adjacency.insert(first, second, weight)
+        if self.reverse_adjacency is not None:
+            self.reverse_adjacency.insert(second, first, weight)
+        self.version += 1
+
+    def remove_edge(self, first, second):
+        """ removes an existing edge. O(V + E) """
+        self._check_vertices(first, second)
+        self.adjacency.remove(first, second)
+        if self.reverse_adjacency is not None:
+            self.reverse_adjacency.remove(second, first)
+        self.version += 1
 
     def get_vertices(self):
         """ return list of vertices in graph """
@@ -124,24 +370,49 @@ class WeightedDiGraph(object):
         """ return a dictionary mapping vertex ids to vertices """
         return self.vertices
 
+    def get_edge_count(self):
+        """ returns the number of edges in the graph """
+        return self.adjacency.edge_count()
+
     def get_edges(self):
         """ gets a list of all edges in graph """
-        return [self.graph[u][v]
-                    for u in self.graph.keys()
-                        for v in self.graph[u].keys()]
+        return [Edge(u, v, weight)
+                    for u, v, weight in self.adjacency.iter_edges()]
+
+    def get_neighbour_ids(self, node_id):
+        """ returns the ids of vertices reachable in one hop from the
+            node with id node_id in the graph """
+        return self.adjacency.neighbour_ids(node_id)
 
     def get_neighbours(self, node_id):
         """ returns list of vertices reachable in one hop from the
             node with id node_id in the graph """
-        return [self.vertices[i] for i in self.graph[node_id].keys()]
+        return [self.vertices[i] for i in self.get_neighbour_ids(node_id)]
+
+    def get_parent_ids(self, node_id):
+        """ returns the ids of vertices with an edge to the node with
+            id node_id. O(in-degree) with the reverse index, otherwise
+            O(Edges) """
+        if self.reverse_adjacency is not None:
+            return self.reverse_adjacency.neighbour_ids(node_id)
+        return sorted(set(
+            u for u, v, _ in self.adjacency.iter_edges() if v == node_id))
 
     def get_parents(self, node_id):
-        """ Gets the parents of a node. O(Edges) operation"""
-        return [self.vertices[i] for i in set([
-            edge.get_first_vertex() for edge in self.get_edges()
-                if edge.get_second_vertex() == node_id
-                ]
-            )]
+        """ Gets the parents of a node """
+        return [self.vertices[i] for i in self.get_parent_ids(node_id)]
+
+    def get_incoming_edges(self, node_id):
+        """ returns the list of edges ending at the node with id node_id.
+            O(in-degree) with the reverse index, otherwise O(Edges) """
+        if self.reverse_adjacency is not None:
+            reverse = self.reverse_adjacency
+            return [Edge(reverse.targets[i], node_id, reverse.weights[i])
+                    for i in xrange(reverse.offsets[node_id],
+                                    reverse.offsets[node_id + 1])]
+        return [Edge(u, v, weight)
+                    for u, v, weight in self.adjacency.iter_edges()
+                        if v == node_id]
 
     def set_vertex_value(self, vertex_id, key, value):
         """ sets a value on the given vertex at the given key """
@@ -153,93 +424,704 @@ class WeightedDiGraph(object):
 
     def get_weight_of_edge(self, first, second):
         """ returns the weight of a given edge in the graph """
-        if self.graph[first].has_key(second):
-            return self.graph[first][second].weight
+        i = self.adjacency.find(first, second)
+        if i >= 0:
+            return self.adjacency.weights[i]
         return float("+inf")
 
     def print_edges(self):
         """ prints edges of the graph to the console """
-        for u_id in self.graph.keys():
-            for v_id in self.graph[u_id].keys():
-                print u_id, v_id, str(self.graph[u_id][v_id])
+        for u_id, v_id, weight in self.adjacency.iter_edges():
+            print u_id, v_id, str(Edge(u_id, v_id, weight))
 
     def print_vertices(self):
         """ print vertices in graph to the console  """
         for vertex in self.get_vertices():
             print vertex
 
-def init_single_source(graph, source_id):
-    """ initialises a graph for single source shortest path problems """
+class _Unreached(dict):
+    """ dict that returns a default for missing keys without storing it """
+
+    def __init__(self, default):
+        super(_Unreached, self).__init__()
+        self.default = default
+
+    def __missing__(self, key):
+        return self.default
+
+
+class SearchContext(object):
+    """ Holds the state of one shortest path query: the path cost and
+        predecessor of each vertex reached. Algorithms write here instead
+        of the vertex workspaces, so a graph can serve several queries at
+        once. If n_vertices is given the state is kept in dense lists,
+        otherwise in dicts that only hold the vertices reached, which
+        suits searches that touch a small part of the graph. """
+
+    def __init__(self, n_vertices=None):
+        self.n_vertices = n_vertices
+        self.source = None
+        self.target = None
+        self.distances = None
+        self.predecessors = None
+        self.clear()
+
+    def clear(self):
+        """ forgets every vertex reached """
+        if self.n_vertices is None:
+            self.distances = _Unreached(INFINITY)
+            self.predecessors = _Unreached(None)
+        else:
+            self.distances = [INFINITY] * self.n_vertices
+            self.predecessors = [None] * self.n_vertices
+
+    def reset(self, source, target=None):
+        """ prepares the context for a query from source """
+        self.clear()
+        self.source = source
+        self.target = target
+        self.distances[source] = 0
+
+    def is_dense(self):
+        """ true if the state is kept in lists indexed by vertex id """
+        return self.n_vertices is not None
+
+    def get_cost(self, vertex_id):
+        """ returns the path cost found for a vertex, or infinity """
+        return self.distances[vertex_id]
+
+    def get_predecessor(self, vertex_id):
+        """ returns the predecessor found for a vertex, or None """
+        return self.predecessors[vertex_id]
+
+    def update(self, vertex_id, cost, predecessor):
+        """ records a new path cost and predecessor for a vertex """
+        self.distances[vertex_id] = cost
+        self.predecessors[vertex_id] = predecessor
+
+    def forget(self, vertex_id):
+        """ marks a vertex as not reached """
+        if self.is_dense():
+            self.distances[vertex_id] = INFINITY
+            self.predecessors[vertex_id] = None
+        else:
+            self.distances.pop(vertex_id, None)
+            self.predecessors.pop(vertex_id, None)
+
+    def is_reached(self, vertex_id):
+        """ true if a path to the vertex has been found """
+        return self.distances[vertex_id] < INFINITY
+
+    def reached_vertices(self):
+        """ returns the ids of all vertices a path has been found to """
+        if self.is_dense():
+            return [v for v in xrange(self.n_vertices)
+                        if self.distances[v] < INFINITY]
+        return self.distances.keys()
+
+
+class SearchStats(object):
+    """ Optional collector of the work done by searches, for logging the
+        cost of individual queries. Counts accumulate over every search
+        it is passed to until reset. Searches given no collector skip
+        the counting entirely. """
+
+    COUNTERS = ("heap_pushes", "heap_pops", "relaxations",
+                "successful_relaxations", "settled", "edges_scanned")
+
+    def __init__(self):
+        self.timings = None
+        self.reset()
+
+    def reset(self):
+        """ zeroes every counter and timing """
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.timings = {}
+
+    def add_time(self, phase, seconds):
+        """ adds wall-clock seconds spent in a phase of a search """
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def as_dict(self):
+        """ returns the counters and phase timings as a plain dict """
+        result = dict((name, getattr(self, name)) for name in self.COUNTERS)
+        result["timings"] = dict(self.timings)
+        return result
+
+    def __repr__(self):
+        return "SearchStats({0})".format(", ".join(
+            "{0}={1}".format(name, getattr(self, name))
+            for name in self.COUNTERS))
+
+
+def init_single_source(graph, source_id, context=None):
+    """ initialises a graph, or the given SearchContext, for single
+        source shortest path problems """
+    if context is not None:
+        context.reset(source_id)
+        return
+
     for vertex in graph.get_vertices():
         if source_id == vertex.node_id:
             graph.set_vertex_value(vertex.node_id, PATH_COST, 0)
         else:
-            graph.set_vertex_value(vertex.node_id, PATH_COST, float("+inf"))
+            graph.set_vertex_value(vertex.node_id, PATH_COST, INFINITY)
             graph.set_vertex_value(vertex.node_id, PREDECESSOR, None)
 
-def relax(graph, u_vertex, v_vertex):
-    """ performs the relaxation update if necessary for a vertex """
+def relax(graph, u_vertex, v_vertex, context=None, stats=None):
+    """ performs the relaxation update if necessary for a vertex. The
+        update goes to the given SearchContext, or else to the graph.
+        The attempt is counted in stats, if given. Returns True if the
+        path cost of v_vertex was lowered. """
     u_id = u_vertex.node_id
     v_id = v_vertex.node_id
 
-    u_distance = graph.get_vertex_value(u_id, PATH_COST)
-    v_distance = graph.get_vertex_value(v_id, PATH_COST)
+    if context is not None:
+        new_distance = (context.get_cost(u_id) +
+                        graph.get_weight_of_edge(u_id, v_id))
+        lowered = context.get_cost(v_id) > new_distance
+        if lowered:
+            context.update(v_id, new_distance, u_id)
+    else:
+        u_distance = graph.get_vertex_value(u_id, PATH_COST)
+        v_distance = graph.get_vertex_value(v_id, PATH_COST)
 
-    new_distance = u_distance + graph.get_weight_of_edge(u_id, v_id)
+        new_distance = u_distance + graph.get_weight_of_edge(u_id, v_id)
 
-    if v_distance > new_distance:
-        graph.set_vertex_value(v_id, PATH_COST, new_distance)
-        graph.set_vertex_value(v_id, PREDECESSOR, u_id)
+        lowered = v_distance > new_distance
+        if lowered:
+            graph.set_vertex_value(v_id, PATH_COST, new_distance)
+            graph.set_vertex_value(v_id, PREDECESSOR, u_id)
 
-def make_heap(graph):
-    """ makes a heap out of the vertices of a graph, ordered by """
-    q_vertices = graph.get_vertices()
+    if stats is not None:
+        stats.edges_scanned += 1
+        stats.relaxations += 1
+        if lowered:
+            stats.successful_relaxations += 1
+    return lowered
 
-    heap = []
-    for elem in q_vertices:
-        heapq.heappush(heap, elem)
+def store_in_workspace(graph, context):
+    """ copies the result held in a SearchContext into the vertex
+        workspaces of the graph, as init_single_source and relax
+        would have left them """
+    init_single_source(graph, context.source)
+    for vertex_id in context.reached_vertices():
+        if vertex_id != context.source:
+            graph.set_vertex_value(
+                vertex_id, PATH_COST, context.get_cost(vertex_id))
+            graph.set_vertex_value(
+                vertex_id, PREDECESSOR, context.get_predecessor(vertex_id))
+
+def dijkstra_search(graph, source, target=None, context=None, stats=None):
+    """ Single-source shortest paths from source using a binary heap of
+        (cost, vertex_id) tuples. Entries made stale by a later improvement
+        are skipped when popped rather than removed from the heap. If a
+        target is given the search stops as soon as it is settled.
+        The graph is only read; the result is written to context (a new
+        dense SearchContext if none is given), which is returned. The
+        work done is added to stats, if given. """
+    counting = stats is not None
+    if counting:
+        started = default_timer()
+    if context is None:
+        context = SearchContext(graph.vertex_count)
+    context.reset(source, target)
+    if counting:
+        searching = default_timer()
+        stats.add_time("init", searching - started)
+
+    distances = context.distances
+    predecessors = context.predecessors
+    adjacency = graph.adjacency
+    offsets = adjacency.offsets
+    targets = adjacency.targets
+    weights = adjacency.weights
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+
+    # only pops are counted in the loop: every scanned edge is a
+    # relaxation attempt and every successful one is a push
+    pops = settled = scanned = 0
+    heap = [(0, source)]
+    while heap:
+        cost, u_id = heappop(heap)
+        if counting:
+            pops += 1
+        if cost > distances[u_id]:
+            continue
+        if u_id == target:
+            if counting:
+                settled += 1
+            break
+        first, last = offsets[u_id], offsets[u_id + 1]
+        if counting:
+            settled += 1
+            scanned += last - first
+        for i in xrange(first, last):
+            v_id = targets[i]
+            new_cost = cost + weights[i]
+            if new_cost < distances[v_id]:
+                distances[v_id] = new_cost
+                predecessors[v_id] = u_id
+                heappush(heap, (new_cost, v_id))
 
-    return heap
+    if counting:
+        pushes = pops + len(heap)
+        stats.heap_pushes += pushes
+        stats.heap_pops += pops
+        stats.settled += settled
+        stats.edges_scanned += scanned
+        stats.relaxations += scanned
+        stats.successful_relaxations += pushes - 1
+        stats.add_time("search", default_timer() - searching)
+    return context
 
-def dijikstra(graph, source):
+def dijikstra(graph, source, target=None, context=None, stats=None):
     """ Performs the dijikstra alrgorithm for the single-source
-        shortest path on the given_graph from the given source """
-    init_single_source(graph, source)
-    s_vertices = []
-    heap = make_heap(graph)
+        shortest path on the given_graph from the given source.
+        If no SearchContext is given the result is also stored in
+        the vertex workspaces, so only one such query may run on a
+        graph at a time. The work done is added to stats, if given.
+        Returns the SearchContext used. """
+    if context is not None:
+        return dijkstra_search(graph, source, target, context, stats)
 
-    while len(heap) > 0:
-        min_vertex = heapq.heappop(heap)
-        s_vertices.append(min_vertex)
-        neighbours = graph.get_neighbours(min_vertex.get_node_id())
+    context = dijkstra_search(graph, source, target, stats=stats)
+    if stats is not None:
+        started = default_timer()
+    store_in_workspace(graph, context)
+    if stats is not None:
+        stats.add_time("workspace", default_timer() - started)
+    return context
 
-        for vertex in neighbours:
-            relax(graph, min_vertex, vertex)
+def reachable_within(graph, source, max_cost, context=None):
+    """ Finds every vertex whose shortest path cost from source is at
+        most max_cost. Vertices beyond the budget are never queued, so
+        the work done is bounded by the part of the graph within it.
+        The search state goes to context (a new sparse SearchContext if
+        none is given), where the predecessors can be read. Returns a
+        dict mapping each vertex reached to its path cost. """
+    if context is None:
+        context = SearchContext()
+    context.reset(source)
 
-        heapq.heapify(heap)
+    distances = context.distances
+    predecessors = context.predecessors
+    adjacency = graph.adjacency
+    offsets = adjacency.offsets
+    targets = adjacency.targets
+    weights = adjacency.weights
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+
+    within = {}
+    heap = [(0, source)]
+    while heap:
+        cost, u_id = heappop(heap)
+        if cost > distances[u_id]:
+            continue
+        within[u_id] = cost
+        for i in xrange(offsets[u_id], offsets[u_id + 1]):
+            v_id = targets[i]
+            new_cost = cost + weights[i]
+            if new_cost <= max_cost and new_cost < distances[v_id]:
+                distances[v_id] = new_cost
+                predecessors[v_id] = u_id
+                heappush(heap, (new_cost, v_id))
+
+    return within
+
+def bidirectional_dijkstra(graph, source, target):
+    """ Point-to-point shortest path that searches forward from source
+        and backward over incoming edges from target, stopping once the
+        two frontiers can no longer improve on the best meeting point.
+        Needs the graph's reverse index. Returns a Path, or raises
+        ValueError if target is not reachable from source. """
+    if graph.reverse_adjacency is None:
+        raise ValueError("bidirectional_dijkstra needs a graph "
+                         "built with reverse_index=True")
+    if source == target:
+        return Path((source,), 0)
+
+    forward = SearchContext()
+    forward.reset(source)
+    backward = SearchContext()
+    backward.reset(target)
+    forward_heap = [(0, source)]
+    backward_heap = [(0, target)]
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+
+    best = INFINITY
+    meeting = None
+    while forward_heap and backward_heap:
+        if forward_heap[0][0] + backward_heap[0][0] >= best:
+            break
+
+        if forward_heap[0][0] <= backward_heap[0][0]:
+            heap, adjacency = forward_heap, graph.adjacency
+            this_side, other_side = forward, backward
+        else:
+            heap, adjacency = backward_heap, graph.reverse_adjacency
+            this_side, other_side = backward, forward
+
+        distances = this_side.distances
+        predecessors = this_side.predecessors
+        other_distances = other_side.distances
+        targets = adjacency.targets
+        weights = adjacency.weights
+
+        cost, u_id = heappop(heap)
+        if cost > distances[u_id]:
+            continue
+        for i in xrange(adjacency.offsets[u_id], adjacency.offsets[u_id + 1]):
+            v_id = targets[i]
+            new_cost = cost + weights[i]
+            if new_cost < distances[v_id]:
+                distances[v_id] = new_cost
+                predecessors[v_id] = u_id
+                heappush(heap, (new_cost, v_id))
+                through_v = new_cost + other_distances[v_id]
+                if through_v < best:
+                    best = through_v
+                    meeting = v_id
+
+    if meeting is None:
+        raise ValueError("{0} is not reachable from {1}".format(target, source))
+
+    path = []
+    current = meeting
+    while current is not None:
+        path.append(current)
+        current = forward.get_predecessor(current)
+    path.reverse()
+    current = backward.get_predecessor(meeting)
+    while current is not None:
+        path.append(current)
+        current = backward.get_predecessor(current)
+
+    return Path(path, best)
+
+def astar(graph, source, target, heuristic=None, coordinates=None,
+          context=None):
+    """ A* search for a shortest path from source to target. heuristic
+        is called as heuristic(vertex_id, target) and must never
+        overestimate the remaining cost. If it is not given but a mapping
+        of vertex ids to (lat, lon) coordinates is, a HaversineHeuristic
+        on those coordinates is used; with neither this is Dijkstra.
+        The search state goes to context (a new sparse SearchContext if
+        none is given). Returns a Path, or raises ValueError if target
+        is not reachable from source. """
+    if heuristic is None:
+        if coordinates is not None:
+            heuristic = HaversineHeuristic(coordinates)
+        else:
+            heuristic = lambda vertex_id, target_id: 0
+    if context is None:
+        context = SearchContext()
+    context.reset(source, target)
 
-def bellman_ford(graph, source):
+    distances = context.distances
+    predecessors = context.predecessors
+    adjacency = graph.adjacency
+    offsets = adjacency.offsets
+    targets = adjacency.targets
+    weights = adjacency.weights
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+    estimates = {}
+
+    heap = [(heuristic(source, target), 0, source)]
+    while heap:
+        _, cost, u_id = heappop(heap)
+        if cost > distances[u_id]:
+            continue
+        if u_id == target:
+            return create_path_from_graph(graph, source, target, context)
+        for i in xrange(offsets[u_id], offsets[u_id + 1]):
+            v_id = targets[i]
+            new_cost = cost + weights[i]
+            if new_cost < distances[v_id]:
+                distances[v_id] = new_cost
+                predecessors[v_id] = u_id
+                estimate = estimates.get(v_id)
+                if estimate is None:
+                    estimate = estimates[v_id] = heuristic(v_id, target)
+                heappush(heap, (new_cost + estimate, new_cost, v_id))
+
+    raise ValueError("{0} is not reachable from {1}".format(target, source))
+
+def _masked_shortest_path(graph, source, target, banned_vertices,
+                          banned_edges):
+    """ Dijkstra from source to target that never enters banned_vertices
+        and never takes an edge (u, v) with v in banned_edges.get(u).
+        Returns (cost, path list), or None if target is unreachable. """
+    context = SearchContext()
+    context.reset(source, target)
+    distances = context.distances
+    predecessors = context.predecessors
+    adjacency = graph.adjacency
+    offsets = adjacency.offsets
+    targets = adjacency.targets
+    weights = adjacency.weights
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+
+    heap = [(0, source)]
+    while heap:
+        cost, u_id = heappop(heap)
+        if cost > distances[u_id]:
+            continue
+        if u_id == target:
+            path = [target]
+            while path[-1] != source:
+                path.append(predecessors[path[-1]])
+            path.reverse()
+            return cost, path
+        banned_targets = banned_edges.get(u_id, ())
+        for i in xrange(offsets[u_id], offsets[u_id + 1]):
+            v_id = targets[i]
+            if v_id in banned_vertices or v_id in banned_targets:
+                continue
+            new_cost = cost + weights[i]
+            if new_cost < distances[v_id]:
+                distances[v_id] = new_cost
+                predecessors[v_id] = u_id
+                heappush(heap, (new_cost, v_id))
+
+    return None
+
+def k_shortest_paths(graph, source, target, k):
+    """ Yen's algorithm for the k cheapest loopless paths from source to
+        target. Each accepted path is deviated from at every vertex from
+        the one where it left its parent path onwards (Lawler's
+        refinement, so earlier spur searches are not repeated), with the
+        root of the path and the edges already used after that root
+        masked out of the search rather than removed from a copy of the
+        graph. Candidates wait in a heap ordered by cost. Returns a list
+        of at most k Paths, cheapest first. """
+    if k < 1:
+        return []
+    first = _masked_shortest_path(graph, source, target, (), {})
+    if first is None:
+        return []
+
+    paths = [Path(first[1], first[0])]
+    deviations = [0]
+    candidates = []
+    seen = set([paths[0].path])
+    while len(paths) < k:
+        last = paths[-1].path
+        root_cost = 0
+        for i in xrange(len(last) - 1):
+            spur = last[i]
+            if i >= deviations[-1]:
+                root = last[:i + 1]
+                banned_edges = {}
+                for path in paths:
+                    if len(path) > i + 1 and path.path[:i + 1] == root:
+                        banned_edges.setdefault(spur, set()).add(path[i + 1])
+                found = _masked_shortest_path(
+                    graph, spur, target, set(root[:-1]), banned_edges)
+                if found is not None:
+                    spur_cost, spur_path = found
+                    candidate = root[:-1] + tuple(spur_path)
+                    if candidate not in seen:
+                        seen.add(candidate)
+                        heapq.heappush(
+                            candidates, (root_cost + spur_cost, candidate, i))
+            root_cost += graph.get_weight_of_edge(spur, last[i + 1])
+
+        if not candidates:
+            break
+        cost, path, deviation = heapq.heappop(candidates)
+        paths.append(Path(path, cost))
+        deviations.append(deviation)
+
+    return paths
+
+def repair_shortest_paths(graph, context, changed_edges):
+    """ Brings a SearchContext holding a complete search (one run without
+        a target) up to date after the edges in changed_edges, given as
+        (first, second) pairs, had their weights changed or were added
+        or removed. In the manner of Ramalingam and Reps' dynamic
+        algorithm only the affected part of the shortest path tree is
+        reprocessed: the subtrees hanging from tree edges that got more
+        expensive are cut off, reconnected from their cheapest parents
+        outside the cut, and the changes propagated with a heap as in
+        dijkstra_search. Weights must be non-negative. Returns the
+        context. """
+    if context.target is not None:
+        raise ValueError("only the result of a search without "
+                         "a target can be repaired")
+
+    distances = context.distances
+    predecessors = context.predecessors
+    adjacency = graph.adjacency
+    offsets = adjacency.offsets
+    targets = adjacency.targets
+    weights = adjacency.weights
+
+    # vertices whose tree path used an edge that got more expensive
+    affected = set()
+    queue = deque()
+    for u_id, v_id in changed_edges:
+        if (predecessors[v_id] == u_id and v_id not in affected and
+                distances[u_id] + graph.get_weight_of_edge(u_id, v_id)
+                > distances[v_id]):
+            affected.add(v_id)
+            queue.append(v_id)
+    while queue:
+        u_id = queue.popleft()
+        for i in xrange(offsets[u_id], offsets[u_id + 1]):
+            v_id = targets[i]
+            if predecessors[v_id] == u_id and v_id not in affected:
+                affected.add(v_id)
+                queue.append(v_id)
+
+    for vertex_id in affected:
+        context.forget(vertex_id)
+
+    heap = []
+    for v_id in affected:
+        for edge in graph.get_incoming_edges(v_id):
+            u_id = edge.get_first_vertex()
+            new_cost = distances[u_id] + edge.weight
+            if new_cost < distances[v_id]:
+                context.update(v_id, new_cost, u_id)
+        if context.is_reached(v_id):
+            heap.append((distances[v_id], v_id))
+
+    # edges that got cheaper may offer better paths anywhere
+    for u_id, v_id in changed_edges:
+        new_cost = distances[u_id] + graph.get_weight_of_edge(u_id, v_id)
+        if new_cost < distances[v_id]:
+            context.update(v_id, new_cost, u_id)
+            heap.append((new_cost, v_id))
+
+    heapq.heapify(heap)
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+    while heap:
+        cost, u_id = heappop(heap)
+        if cost > distances[u_id]:
+            continue
+        for i in xrange(offsets[u_id], offsets[u_id + 1]):
+            v_id = targets[i]
+            new_cost = cost + weights[i]
+            if new_cost < distances[v_id]:
+                distances[v_id] = new_cost
+                predecessors[v_id] = u_id
+                heappush(heap, (new_cost, v_id))
+
+    return context
+
+def bellman_ford(graph, source, context=None, stats=None):
     """ Performs the bellman-ford alrgorithm for the single-source
-        shortest path on the given_graph from the given source """
-    init_single_source(graph, source)
+        shortest path on the given_graph from the given source.
+        The result goes to the given SearchContext, or else to the
+        vertex workspaces. Stops early once a pass over the edges
+        changes nothing. The work done is added to stats, if given.
+        Returns False if a negative cycle is reachable from the
+        source. """
+    if stats is not None:
+        started = default_timer()
+    init_single_source(graph, source, context)
+
+    if context is None:
+        path_cost = lambda vertex_id: graph.get_vertex_value(
+            vertex_id, PATH_COST)
+    else:
+        path_cost = context.get_cost
 
     edges = graph.get_edges()
     vertices = graph.get_vertices_dict()
+    if stats is not None:
+        relaxing = default_timer()
+        stats.add_time("init", relaxing - started)
 
+    converged = False
     for i in xrange(graph.vertex_count):
+        changed = False
         for edge in edges:
-            relax(
-                graph,
-                vertices[edge.get_first_vertex()],
-                vertices[edge.get_second_vertex()])
+            if relax(
+                    graph,
+                    vertices[edge.get_first_vertex()],
+                    vertices[edge.get_second_vertex()],
+                    context,
+                    stats):
+                changed = True
+        # a pass that changes nothing means the costs have converged
+        if not changed:
+            converged = True
+            break
+
+    if stats is not None:
+        checking = default_timer()
+        stats.add_time("relax", checking - relaxing)
+    if converged:
+        return True
 
+    no_negative_cycle = True
     for edge in edges:
         v_id = edge.get_second_vertex()
         u_id = edge.get_first_vertex()
-        v_distance = graph.get_vertex_value(v_id, PATH_COST)
-        u_distance = graph.get_vertex_value(u_id, PATH_COST)
+        v_distance = path_cost(v_id)
+        u_distance = path_cost(u_id)
         weight = graph.get_weight_of_edge(u_id, v_id)
         if v_distance > u_distance + weight:
-            return False
+            no_negative_cycle = False
+            break
+
+    if stats is not None:
+        stats.add_time("negative_cycle_check", default_timer() - checking)
+    return no_negative_cycle
+
+def spfa(graph, source, context=None):
+    """ Queue-based label-correcting variant of bellman_ford: only the
+        edges out of vertices whose path cost changed are relaxed again,
+        and the search ends as soon as no cost changes. Results go to
+        the given SearchContext, or else to the vertex workspaces.
+        Returns False if a negative cycle is reachable from the source,
+        detected by a shortest path growing to vertex_count edges. """
+    workspace = context is None
+    if workspace:
+        context = SearchContext(graph.vertex_count)
+    context.reset(source)
+
+    distances = context.distances
+    predecessors = context.predecessors
+    adjacency = graph.adjacency
+    offsets = adjacency.offsets
+    targets = adjacency.targets
+    weights = adjacency.weights
+    n_vertices = graph.vertex_count
+
+    # number of edges on the current path to each vertex
+    lengths = {source: 0}
+    queue = deque([source])
+    queued = set([source])
+    no_negative_cycle = True
+    while queue and no_negative_cycle:
+        u_id = queue.popleft()
+        queued.discard(u_id)
+        cost = distances[u_id]
+        length = lengths[u_id] + 1
+        for i in xrange(offsets[u_id], offsets[u_id + 1]):
+            v_id = targets[i]
+            new_cost = cost + weights[i]
+            if new_cost < distances[v_id]:
+                distances[v_id] = new_cost
+                predecessors[v_id] = u_id
+                lengths[v_id] = length
+                if length >= n_vertices:
+                    no_negative_cycle = False
+                    break
+                if v_id not in queued:
+                    queue.append(v_id)
+                    queued.add(v_id)
 
-    return True
+    if workspace:
+        store_in_workspace(graph, context)
+    return no_negative_cycle
@@ -0,0 +1,74 @@
+"""
+heuristics.py
+
+Lower bounds on the cost between two vertices, for use with
+graphs.astar, built from the coordinates of GTFS stops.
+"""
+
+import math
+
+# mean radius of the earth in metres
+EARTH_RADIUS = 6371008.8
+
+# default top speed in metres per second (120 km/h)
+MAX_SPEED = 120 / 3.6
+
+
+def haversine_distance(first, second):
+    """ Great circle distance in metres between two (lat, lon)
+        pairs given in degrees """
+    lat_1, lon_1 = math.radians(first[0]), math.radians(first[1])
+    lat_2, lon_2 = math.radians(second[0]), math.radians(second[1])
+
+    a = (math.sin((lat_2 - lat_1) / 2) ** 2 +
+         math.cos(lat_1) * math.cos(lat_2) * math.sin((lon_2 - lon_1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class HaversineHeuristic(object):
+    """ Estimates the cost between two vertices as the time needed to
+        cover the great circle distance between them at max_speed.
+        coordinates maps vertex ids to (lat, lon) pairs. The estimate is
+        admissible and consistent as long as no edge is travelled faster
+        than max_speed, i.e. its weight in seconds is at least its length
+        in metres divided by max_speed. Vertices without coordinates
+        get an estimate of 0. """
+
+    def __init__(self, coordinates, max_speed=MAX_SPEED):
+        self.coordinates = coordinates
+        self.max_speed = float(max_speed)
+
+    def _coordinate(self, vertex_id):
+        """ returns the coordinates of a vertex, or None """
+        try:
+            return self.coordinates[vertex_id]
+        except (KeyError, IndexError):
+            return None
+
+    def __call__(self, vertex_id, target_id):
+        first = self._coordinate(vertex_id)
+        second = self._coordinate(target_id)
+        if first is None or second is None:
+            return 0
+        return haversine_distance(first, second) / self.max_speed
+
+
+def stop_coordinates(stops):
+    """ Builds a list of (lat, lon) pairs from stop rows as returned by
+        GtfsProvider.load_stops, or from Stop objects. Vertex i of a graph
+        built from the same rows is the stop in position i. """
+    # imported here so that graphs, which imports this module, does not
+    # depend on the gtfs package
+    from gtfs.models import Stop
+    from utils.typeconverters import UnicodeToFloatConverter
+    converter = UnicodeToFloatConverter()
+    coordinates = []
+    for stop in stops:
+        if not isinstance(stop, Stop):
+            stop = Stop(stop)
+        coordinates.append((
+            converter.convert(stop.get_stop_lat()),
+            converter.convert(stop.get_stop_lon())
+            ))
+
+    return coordinates
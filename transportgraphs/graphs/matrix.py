@@ -0,0 +1,74 @@
+"""
+matrix.py
+
+Many-to-many shortest path costs, computed with dijkstra_search and
+spread over a pool of worker processes.
+"""
+
+import multiprocessing
+import numpy
+from graphs import SearchContext
+from graphs import dijkstra_search
+
+# the graph used by pool workers. It is set before the pool is started so
+# that forked workers inherit it, sharing its arrays with the parent
+# process instead of receiving a pickled copy.
+_worker_graph = None
+
+
+def distance_rows(graph, sources, targets):
+    """ Returns a len(sources) x len(targets) float matrix of shortest
+        path costs, infinity where a target cannot be reached. Runs one
+        search per source in the calling process. """
+    matrix = numpy.empty((len(sources), len(targets)), dtype=numpy.float64)
+    context = SearchContext(graph.vertex_count)
+    target = targets[0] if len(targets) == 1 else None
+    for row, source in enumerate(sources):
+        distances = dijkstra_search(graph, source, target, context).distances
+        matrix[row] = [distances[target_id] for target_id in targets]
+
+    return matrix
+
+
+def _worker_rows(task):
+    """ Pool task: distance_rows over the inherited graph """
+    sources, targets = task
+    return distance_rows(_worker_graph, sources, targets)
+
+
+def distance_matrix(graph, sources, targets, workers=None):
+    """ Returns a len(sources) x len(targets) float matrix of shortest
+        path costs, infinity where a target cannot be reached. The sources
+        are split into chunks searched by a multiprocessing pool of
+        workers processes (one per CPU by default). Workers are forked
+        from this process and read the graph in place, so only the
+        source chunks and result rows are pickled. With workers=1 the
+        searches run in the calling process. """
+    global _worker_graph
+
+    sources = list(sources)
+    targets = list(targets)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers <= 1 or len(sources) <= 1:
+        return distance_rows(graph, sources, targets)
+
+    # several chunks per worker keep the pool busy when some sources
+    # take longer to search than others
+    n_chunks = min(len(sources), workers * 4)
+    chunks = [(sources[i::n_chunks], targets) for i in xrange(n_chunks)]
+
+    _worker_graph = graph
+    pool = multiprocessing.Pool(workers)
+    try:
+        rows = pool.map(_worker_rows, chunks)
+    finally:
+        pool.close()
+        pool.join()
+        _worker_graph = None
+
+    matrix = numpy.empty((len(sources), len(targets)), dtype=numpy.float64)
+    for i, chunk_rows in enumerate(rows):
+        matrix[i::n_chunks] = chunk_rows
+
+    return matrix
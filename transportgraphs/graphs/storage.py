@@ -0,0 +1,213 @@
+"""
+storage.py
+
+A versioned binary file format for WeightedDiGraph. The file is a fixed
+header followed by the raw CSR arrays, each starting on an 8 byte
+boundary, so that it can be memory-mapped and used in place:
+
+    header     magic, format version, flags, vertex count, edge count,
+               weight typecode and the size of stored integers
+    forward    offsets (V + 1 ints), targets (E ints), weights (E)
+    reverse    the same for the incoming edge index, if flagged
+    vertex ids offsets (V + 1 ints) into a utf-8 blob, if flagged
+"""
+
+import mmap as mmap_module
+import struct
+import sys
+from array import array
+from graphs import CompressedAdjacency
+from graphs import WeightedDiGraph
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+FILE_MAGIC = "TGRAPH\0\0"
+FILE_VERSION = 1
+HEADER = struct.Struct("<8sIIqqcB6x")
+ALIGNMENT = 8
+
+HAS_REVERSE_INDEX = 1
+HAS_VERTEX_IDS = 2
+BIG_ENDIAN = 4
+
+
+def write_array(the_file, values):
+    """ writes an array as its typecode, length and raw items """
+    the_file.write(struct.pack("<cQ", values.typecode, len(values)))
+    values.tofile(the_file)
+
+
+def read_array(the_file):
+    """ reads an array written by write_array """
+    typecode, length = struct.unpack("<cQ", the_file.read(9))
+    values = array(typecode)
+    values.fromfile(the_file, length)
+    return values
+
+
+def _typecode(values):
+    """ the array typecode matching an array or NumPy array """
+    if isinstance(values, array):
+        return values.typecode
+    return 'd' if values.dtype.kind == 'f' else 'l'
+
+
+def _write_section(the_file, values):
+    """ pads the file to the alignment, then writes an array's raw
+        items or a byte string """
+    padding = -the_file.tell() % ALIGNMENT
+    the_file.write("\0" * padding)
+    if isinstance(values, array):
+        values.tofile(the_file)
+    else:
+        the_file.write(values)
+
+
+def save(graph, path):
+    """ Writes a WeightedDiGraph, with its reverse index and vertex ids
+        if it has them, to a binary file at path. Vertex ids are stored
+        as utf-8 text and load as unicode; raises ValueError, before
+        writing anything, if any of them is not a string. """
+    if graph.vertex_ids is not None:
+        for vertex_id in graph.vertex_ids:
+            if not isinstance(vertex_id, basestring):
+                raise ValueError("vertex id {0!r} is not a string".format(
+                    vertex_id))
+
+    adjacency = graph.adjacency
+    flags = 0
+    if graph.reverse_adjacency is not None:
+        flags |= HAS_REVERSE_INDEX
+    if graph.vertex_ids is not None:
+        flags |= HAS_VERTEX_IDS
+    if sys.byteorder == "big":
+        flags |= BIG_ENDIAN
+
+    with open(path, 'wb') as the_file:
+        the_file.write(HEADER.pack(
+            FILE_MAGIC, FILE_VERSION, flags,
+            graph.vertex_count, adjacency.edge_count(),
+            _typecode(adjacency.weights), array('l').itemsize))
+
+        weight_typecode = _typecode(adjacency.weights)
+        structures = [adjacency]
+        if graph.reverse_adjacency is not None:
+            structures.append(graph.reverse_adjacency)
+        for structure in structures:
+            _write_section(the_file, array('l', structure.offsets))
+            _write_section(the_file, array('l', structure.targets))
+            _write_section(the_file, array(weight_typecode, structure.weights))
+
+        if graph.vertex_ids is not None:
+            encoded = [unicode(vertex_id).encode("utf-8")
+                       for vertex_id in graph.vertex_ids]
+            offsets = array('l', [0])
+            for item in encoded:
+                offsets.append(offsets[-1] + len(item))
+            _write_section(the_file, offsets)
+            _write_section(the_file, "".join(encoded))
+
+
+class _SectionReader(object):
+    """ Reads the aligned sections of a graph file in order, either as
+        NumPy views of a memory map or as arrays copied from the file """
+
+    def __init__(self, the_file, int_size, mapped=None):
+        self.the_file = the_file
+        self.int_size = int_size
+        self.mapped = mapped
+        self.position = HEADER.size
+
+    def _align(self):
+        self.position += -self.position % ALIGNMENT
+
+    def read(self, typecode, count):
+        """ returns the next section of count items """
+        self._align()
+        if typecode == 'l':
+            item_size = self.int_size
+        else:
+            item_size = array(typecode).itemsize
+
+        if self.mapped is not None:
+            dtype = 'f8' if typecode == 'd' else 'i{0}'.format(item_size)
+            values = numpy.frombuffer(
+                self.mapped, dtype=dtype, count=count, offset=self.position)
+        else:
+            if array(typecode).itemsize != item_size:
+                raise ValueError("the file was written with {0} byte "
+                                 "integers".format(item_size))
+            self.the_file.seek(self.position)
+            values = array(typecode)
+            values.fromfile(self.the_file, count)
+
+        self.position += count * item_size
+        return values
+
+    def read_bytes(self, count):
+        """ returns the next section of count bytes """
+        self._align()
+        self.the_file.seek(self.position)
+        data = self.the_file.read(count)
+        self.position += count
+        return data
+
+
+def load(path, mmap=False):
+    """ Reads a WeightedDiGraph written by save. By default the arrays
+        are copied into memory, which gives the fastest searches and a
+        graph that can be changed. With mmap (and NumPy) the file is
+        memory-mapped instead and the graph uses NumPy views of it in
+        place: loading is near instant and processes loading the same
+        file share the page cache, but such a graph is read-only, every
+        search is slower as the engines index the views one item at a
+        time (about 2.5x for dijkstra_search on a 40k vertex grid), and
+        weights and path costs come back as NumPy scalars rather than
+        int or float. Raises ValueError if the file is not a graph file
+        this version can read. """
+    with open(path, 'rb') as the_file:
+        header = the_file.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError("{0} is not a graph file".format(path))
+        (magic, version, flags, n_vertices, n_edges,
+         weight_typecode, int_size) = HEADER.unpack(header)
+        if magic != FILE_MAGIC:
+            raise ValueError("{0} is not a graph file".format(path))
+        if version != FILE_VERSION:
+            raise ValueError("{0} is graph file version {1}, expected "
+                             "{2}".format(path, version, FILE_VERSION))
+        if bool(flags & BIG_ENDIAN) != (sys.byteorder == "big"):
+            raise ValueError("{0} was written with the other byte "
+                             "order".format(path))
+
+        mapped = None
+        if mmap and numpy is not None:
+            mapped = mmap_module.mmap(
+                the_file.fileno(), 0, access=mmap_module.ACCESS_READ)
+        reader = _SectionReader(the_file, int_size, mapped)
+
+        def read_adjacency():
+            return CompressedAdjacency(
+                reader.read('l', n_vertices + 1),
+                reader.read('l', n_edges),
+                reader.read(weight_typecode, n_edges))
+
+        adjacency = read_adjacency()
+        reverse_adjacency = None
+        if flags & HAS_REVERSE_INDEX:
+            reverse_adjacency = read_adjacency()
+
+        vertex_ids = None
+        if flags & HAS_VERTEX_IDS:
+            offsets = reader.read('l', n_vertices + 1)
+            blob = reader.read_bytes(int(offsets[-1]))
+            vertex_ids = [blob[offsets[i]:offsets[i + 1]].decode("utf-8")
+                          for i in xrange(n_vertices)]
+
+    graph = WeightedDiGraph.from_adjacency(
+        adjacency, reverse_adjacency, vertex_ids)
+    graph.read_only = mapped is not None
+    return graph
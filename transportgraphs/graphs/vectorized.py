@@ -0,0 +1,217 @@
+"""
+vectorized.py
+
+Shortest path algorithms that work on whole arrays of edges at once
+with NumPy, for graphs where per-edge Python loops are too slow.
+"""
+
+from array import array
+import numpy
+from graphs import CompressedAdjacency
+from graphs import SearchContext
+from graphs import WeightedDiGraph
+from graphs import store_in_workspace
+
+
+def as_numpy(values, dtype):
+    """ Returns an array buffer as a NumPy array of dtype, viewing the
+        buffer in place unless the item type has to change """
+    if isinstance(values, array):
+        values = numpy.frombuffer(values, dtype=values.typecode)
+    return numpy.asarray(values, dtype=dtype)
+
+
+def adjacency_arrays(adjacency):
+    """ Returns the offsets, targets and float weights of a
+        CompressedAdjacency as NumPy arrays """
+    return (as_numpy(adjacency.offsets, numpy.int64),
+            as_numpy(adjacency.targets, numpy.int64),
+            as_numpy(adjacency.weights, numpy.float64))
+
+
+def edge_arrays(graph):
+    """ Returns the edges of a graph as NumPy arrays of first vertices,
+        second vertices and float weights, ordered as in its adjacency """
+    offsets, targets, weights = adjacency_arrays(graph.adjacency)
+    sources = numpy.repeat(
+        numpy.arange(graph.vertex_count, dtype=numpy.int64), numpy.diff(offsets))
+    return sources, targets, weights
+
+
+def as_array(values, typecode):
+    """ Copies a NumPy array into an array of typecode """
+    return array(typecode, numpy.ascontiguousarray(
+        values, dtype=typecode).tostring())
+
+
+def _sorted_adjacency(n_vertices, firsts, seconds, weights, typecode):
+    """ Builds a CompressedAdjacency from NumPy edge arrays, keeping the
+        lowest weight of any repeated edge """
+    order = numpy.lexsort((weights, seconds, firsts))
+    firsts, seconds, weights = firsts[order], seconds[order], weights[order]
+    keep = numpy.ones(len(firsts), dtype=bool)
+    keep[1:] = (firsts[1:] != firsts[:-1]) | (seconds[1:] != seconds[:-1])
+    firsts, seconds, weights = firsts[keep], seconds[keep], weights[keep]
+
+    offsets = numpy.zeros(n_vertices + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(firsts, minlength=n_vertices), out=offsets[1:])
+    return CompressedAdjacency(as_array(offsets, 'l'), as_array(seconds, 'l'),
+                               as_array(weights, typecode))
+
+
+def graph_from_arrays(n_vertices, firsts, seconds, weights,
+                      reverse_index=True, vertex_ids=None):
+    """ Builds a WeightedDiGraph from NumPy arrays of first vertices,
+        second vertices and weights with sorts instead of a Python loop
+        per edge. Unlike the constructor, an edge given more than once
+        keeps its lowest weight. Raises ValueError for a vertex out of
+        range. """
+    firsts = numpy.asarray(firsts, dtype=numpy.int64)
+    seconds = numpy.asarray(seconds, dtype=numpy.int64)
+    weights = numpy.asarray(weights)
+    if firsts.size and (min(firsts.min(), seconds.min()) < 0 or
+                        max(firsts.max(), seconds.max()) >= n_vertices):
+        raise ValueError("edges must be between vertices 0 and "
+                         "{0}".format(n_vertices - 1))
+    typecode = 'd' if weights.dtype.kind == 'f' else 'l'
+
+    adjacency = _sorted_adjacency(n_vertices, firsts, seconds, weights, typecode)
+    reverse_adjacency = None
+    if reverse_index:
+        reverse_adjacency = _sorted_adjacency(
+            n_vertices, seconds, firsts, weights, typecode)
+    return WeightedDiGraph.from_adjacency(
+        adjacency, reverse_adjacency, vertex_ids)
+
+
+def fill_context(context, source, distances, predecessors):
+    """ Copies NumPy distance and predecessor arrays (-1 for none) into
+        a SearchContext prepared for a query from source """
+    context.reset(source)
+    reached = numpy.flatnonzero(numpy.isfinite(distances))
+    for vertex_id, cost, predecessor in zip(
+            reached.tolist(),
+            distances[reached].tolist(),
+            predecessors[reached].tolist()):
+        context.update(vertex_id, cost,
+                       predecessor if predecessor >= 0 else None)
+
+
+def bellman_ford_vectorized(graph, source, context=None):
+    """ Bellman-ford where each pass relaxes every edge at once, taking
+        the minimum candidate cost per vertex with numpy.minimum.at.
+        Stops as soon as a pass lowers no cost. Path costs are floats.
+        Results go to the given SearchContext, or else to the vertex
+        workspaces. Returns False if a negative cycle is reachable
+        from the source. """
+    sources, targets, weights = edge_arrays(graph)
+    n_vertices = graph.vertex_count
+
+    distances = numpy.full(n_vertices, numpy.inf)
+    distances[source] = 0
+    predecessors = numpy.full(n_vertices, -1, dtype=numpy.int64)
+
+    no_negative_cycle = False
+    # costs settle within vertex_count - 1 passes without a negative cycle
+    for _ in xrange(n_vertices):
+        candidates = distances[sources] + weights
+        lowered = distances.copy()
+        numpy.minimum.at(lowered, targets, candidates)
+        improved = lowered < distances
+        if not improved.any():
+            no_negative_cycle = True
+            break
+
+        # predecessor from any edge achieving the new, lower cost
+        achieving = improved[targets] & (candidates == lowered[targets])
+        predecessors[targets[achieving]] = sources[achieving]
+        distances = lowered
+
+    workspace = context is None
+    if workspace:
+        context = SearchContext(n_vertices)
+    fill_context(context, source, distances, predecessors)
+    if workspace:
+        store_in_workspace(graph, context)
+    return no_negative_cycle
+
+
+def _relax_edges(vertices, offsets, targets, weights, edge_mask,
+                 distances, predecessors):
+    """ Relaxes, all at once, the edges out of vertices that are selected
+        by edge_mask. Returns the vertices whose cost was lowered. """
+    starts = offsets[vertices]
+    counts = offsets[vertices + 1] - starts
+    total = counts.sum()
+    if not total:
+        return numpy.empty(0, dtype=numpy.int64)
+
+    # positions in targets/weights of every edge out of vertices
+    row_starts = numpy.cumsum(counts) - counts
+    positions = (numpy.arange(total) - numpy.repeat(row_starts, counts) +
+                 numpy.repeat(starts, counts))
+    selected = edge_mask[positions]
+    positions = positions[selected]
+    sources = numpy.repeat(vertices, counts)[selected]
+    heads = targets[positions]
+
+    candidates = distances[sources] + weights[positions]
+    lower = candidates < distances[heads]
+    sources, heads, candidates = sources[lower], heads[lower], candidates[lower]
+    if not heads.size:
+        return heads
+
+    numpy.minimum.at(distances, heads, candidates)
+    achieving = candidates == distances[heads]
+    predecessors[heads[achieving]] = sources[achieving]
+    return numpy.unique(heads)
+
+
+def delta_stepping(graph, source, delta=None, context=None):
+    """ Delta-stepping single-source shortest paths. Vertices are grouped
+        into buckets of width delta by path cost and the buckets settled
+        in order. Within a bucket the light edges (weight <= delta) out of
+        the whole frontier are relaxed at once with NumPy until no vertex
+        re-enters the bucket, then the heavy edges are relaxed once.
+        delta defaults to the mean edge weight. Weights must be
+        non-negative. Path costs are floats. Results go to context (a new
+        dense SearchContext if none is given), which is returned. """
+    offsets, targets, weights = adjacency_arrays(graph.adjacency)
+    if weights.size and weights.min() < 0:
+        raise ValueError("delta_stepping needs non-negative edge weights")
+    if delta is None:
+        delta = weights.mean() if weights.size else 1.0
+    if delta <= 0:
+        delta = 1.0
+    light = weights <= delta
+    heavy = ~light
+
+    n_vertices = graph.vertex_count
+    distances = numpy.full(n_vertices, numpy.inf)
+    distances[source] = 0
+    predecessors = numpy.full(n_vertices, -1, dtype=numpy.int64)
+    settled = numpy.zeros(n_vertices, dtype=bool)
+
+    while True:
+        pending = ~settled & numpy.isfinite(distances)
+        if not pending.any():
+            break
+        upper = (numpy.floor(distances[pending].min() / delta) + 1) * delta
+
+        frontier = numpy.flatnonzero(pending & (distances < upper))
+        bucket = [frontier]
+        while frontier.size:
+            lowered = _relax_edges(frontier, offsets, targets, weights, light,
+                                   distances, predecessors)
+            frontier = lowered[distances[lowered] < upper]
+            bucket.append(frontier)
+
+        bucket = numpy.unique(numpy.concatenate(bucket))
+        _relax_edges(bucket, offsets, targets, weights, heavy,
+                     distances, predecessors)
+        settled[bucket] = True
+
+    if context is None:
+        context = SearchContext(n_vertices)
+    fill_context(context, source, distances, predecessors)
+    return context
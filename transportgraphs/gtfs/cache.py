@@ -0,0 +1,238 @@
+"""
+cache.py
+
+A persistent cache of parsed GTFS tables in front of a GtfsProviderCsv
+(or GtfsProviderZip), so that repeated runs against the same feed skip
+the csv parsing. Rows are kept as pickles and ColumnTables as one .npy
+file per column. A manifest records the size, modification time and
+sha1 of the source file each entry was parsed from.
+"""
+
+import cPickle
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from gtfsprovider import GtfsProvider
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+CACHE_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+# bytes hashed at a time
+HASH_BLOCK = 1024 * 1024
+
+
+class GtfsProviderCached(GtfsProvider):
+    """ Serves load_X and load_columns from parsed tables stored in
+        cache_directory, parsing through provider only when a table is
+        not cached or its source file has changed. A source file whose
+        size and modification time match the manifest is taken as
+        unchanged; one whose modification time alone differs is hashed,
+        and kept if its content is the same. For a zip member the CRC-32
+        in the archive is part of the modification time, so a member
+        rebuilt with a fixed timestamp is still noticed. Missing files
+        are left to provider and not cached. """
+
+    def __init__(self, provider, cache_directory):
+        self.provider = provider
+        self.cache_directory = cache_directory
+        self.manifest = None
+
+    def _path(self, *parts):
+        return os.path.join(self.cache_directory, *parts)
+
+    def _load_manifest(self):
+        """ reads the manifest, starting afresh if it is missing or was
+            written by another version """
+        if self.manifest is not None:
+            return self.manifest
+        manifest = {}
+        try:
+            with open(self._path(MANIFEST_FILE), 'rb') as the_file:
+                stored = json.load(the_file)
+            if stored.get("version") == CACHE_VERSION:
+                manifest = stored["files"]
+        except (IOError, ValueError, KeyError):
+            pass
+        self.manifest = manifest
+        return manifest
+
+    def _save_manifest(self):
+        self._write(MANIFEST_FILE, lambda the_file: json.dump(
+            {"version": CACHE_VERSION, "files": self.manifest},
+            the_file, indent=2, sort_keys=True))
+
+    def _write(self, name, write):
+        """ writes a cache file through write(the_file), replacing any
+            old one only once it is complete """
+        if not os.path.isdir(self.cache_directory):
+            os.makedirs(self.cache_directory)
+        handle, temporary = tempfile.mkstemp(dir=self.cache_directory)
+        try:
+            with os.fdopen(handle, 'wb') as the_file:
+                write(the_file)
+            os.rename(temporary, self._path(name))
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    def _digest(self, filename):
+        """ sha1 of the content of a source file """
+        digest = hashlib.sha1()
+        with self.provider.open_gtfs_file(filename) as the_file:
+            for block in iter(lambda: the_file.read(HASH_BLOCK), ""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry(self, filename):
+        """ returns the manifest entry of a source file, bringing it up
+            to date: entries of a changed file lose their cached tables """
+        manifest = self._load_manifest()
+        size, mtime = self.provider.stamp_gtfs_file(filename)
+        entry = manifest.get(filename)
+        if entry is not None and entry["size"] == size:
+            if entry["mtime"] == mtime:
+                return entry
+            if entry["sha1"] == self._digest(filename):
+                entry["mtime"] = mtime
+                self._save_manifest()
+                return entry
+
+        self._remove_tables(filename)
+        entry = manifest[filename] = {
+            "size": size, "mtime": mtime, "sha1": self._digest(filename),
+            "tables": []}
+        self._save_manifest()
+        return entry
+
+    def _remove_tables(self, filename):
+        """ deletes the cached tables of a source file """
+        for name in (filename + ".rows", filename + ".columns"):
+            path = self._path(name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+    def _cached(self, filename, kind, read, parse, write):
+        """ returns the table of a kind for a source file, from the
+            cache if it is fresh, else parsed and, unless parse gave
+            None, stored """
+        entry = self._entry(filename)
+        if kind in entry["tables"]:
+            try:
+                return read()
+            except (IOError, EOFError, ValueError, cPickle.UnpicklingError):
+                entry["tables"].remove(kind)
+
+        table = parse()
+        if table is None:
+            return None
+        write(table)
+        entry["tables"].append(kind)
+        self._save_manifest()
+        return table
+
+    def load_rows(self, filename):
+        """ Loads a GTFS file into a list of row dicts, from the cache
+            where possible. As for the provider, a missing file is
+            reported and gives None. """
+        if not self.provider.has_gtfs_file(filename):
+            return self.provider.load_gtfs_file(None, filename)
+
+        name = filename + ".rows"
+
+        def read():
+            with open(self._path(name), 'rb') as the_file:
+                return cPickle.load(the_file)
+
+        def write(rows):
+            self._write(name, lambda the_file: cPickle.dump(
+                rows, the_file, cPickle.HIGHEST_PROTOCOL))
+
+        return self._cached(
+            filename, "rows", read,
+            lambda: self.provider.load_gtfs_file(None, filename), write)
+
+    def load_columns(self, filename, dictionaries=None):
+        """ Loads a GTFS file into a ColumnTable, from the cache where
+            possible. Codes are stored against the table's own
+            dictionaries and re-encoded into dictionaries if it is
+            given. Raises ValueError if the file is missing. """
+        # imported here as only the columnar mode needs NumPy
+        import columnar
+        if not self.provider.has_gtfs_file(filename):
+            raise ValueError("{0} is not in the feed".format(filename))
+
+        directory = self._path(filename + ".columns")
+
+        def read():
+            with open(os.path.join(directory, "dictionaries.pickle"), 'rb') as the_file:
+                names, table_dictionaries = cPickle.load(the_file)
+            columns = dict(
+                (name, numpy.load(os.path.join(directory, "{0}.npy".format(i))))
+                for i, name in enumerate(names))
+            return columnar.ColumnTable(names, columns, table_dictionaries)
+
+        def write(table):
+            if os.path.isdir(directory):
+                shutil.rmtree(directory)
+            os.makedirs(directory)
+            for i, name in enumerate(table.names):
+                numpy.save(os.path.join(directory, "{0}.npy".format(i)),
+                           table[name])
+            with open(os.path.join(directory, "dictionaries.pickle"), 'wb') as the_file:
+                cPickle.dump((table.names, table.dictionaries), the_file,
+                             cPickle.HIGHEST_PROTOCOL)
+
+        table = self._cached(
+            filename, "columns", read,
+            lambda: self.provider.load_columns(filename), write)
+        if dictionaries is None:
+            return table
+        return columnar.merge_tables(
+            [table], columnar.SCHEMAS[filename], dictionaries)
+
+    def clear(self):
+        """ Deletes everything cached """
+        if os.path.isdir(self.cache_directory):
+            shutil.rmtree(self.cache_directory)
+        self.manifest = None
+
+    def load_agency(self):
+        """ Loads agency file to a list. """
+        return self.load_rows(self.provider.AGENCY_FILE)
+
+    def load_calendar_dates(self):
+        """ Loads calendar_dates file to a list. """
+        return self.load_rows(self.provider.CALENDAR_DATES_FILE)
+
+    def load_calendar(self):
+        """ Loads calendar file to a list. """
+        return self.load_rows(self.provider.CALENDAR_FILE)
+
+    def load_shapes(self):
+        """ Loads shapes file to a list. """
+        return self.load_rows(self.provider.SHAPES_FILE)
+
+    def load_stops(self):
+        """ Loads stops file to a list. """
+        return self.load_rows(self.provider.STOPS_FILE)
+
+    def load_routes(self):
+        """ Loads routes file to a list. """
+        return self.load_rows(self.provider.ROUTES_FILE)
+
+    def load_stop_times(self):
+        """ Loads stop_times file to a list. """
+        return self.load_rows(self.provider.STOP_TIMES_FILE)
+
+    def load_trips(self):
+        """ Loads trips file to a list. """
+        return self.load_rows(self.provider.TRIPS_FILE)
@@ -0,0 +1,385 @@
+"""
+columnar.py
+
+Loads GTFS tables into typed NumPy columns rather than lists of unicode
+dicts. Each schema is derived from the key lists in gtfs.models:
+
+    times       int32 seconds after midnight (hours may pass 24)
+    dates       int32 YYYYMMDD
+    lat/lon     float64, as are distances travelled
+    sequences   int16
+    flags       int8 (pickup_type, weekdays, direction_id...)
+    ids, text   int32 codes into a dictionary of the distinct values
+
+Missing values are -1, or NaN in float columns.
+"""
+
+import csv
+import multiprocessing
+import os
+from array import array
+import numpy
+import models
+from graphs.vectorized import graph_from_arrays
+from interning import IdTable
+from interning import MISSING
+from gtfsprovider import GtfsProviderCsv
+
+ID = "id"
+TEXT = "text"
+TIME = "time"
+DATE = "date"
+FLOAT = "float"
+INT16 = "int16"
+INT8 = "int8"
+
+# NumPy dtype and array typecode used to accumulate each kind of column
+KIND_TYPES = {
+    ID: (numpy.int32, 'i'),
+    TEXT: (numpy.int32, 'i'),
+    TIME: (numpy.int32, 'i'),
+    DATE: (numpy.int32, 'i'),
+    FLOAT: (numpy.float64, 'd'),
+    INT16: (numpy.int16, 'h'),
+    INT8: (numpy.int8, 'b'),
+    }
+
+# the kind of every typed GTFS column; anything else is TEXT
+COLUMN_KINDS = {
+    u"agency_id": ID,
+    u"stop_id": ID,
+    u"trip_id": ID,
+    u"route_id": ID,
+    u"service_id": ID,
+    u"shape_id": ID,
+    u"arrival_time": TIME,
+    u"departure_time": TIME,
+    u"date": DATE,
+    u"start_date": DATE,
+    u"end_date": DATE,
+    u"stop_lat": FLOAT,
+    u"stop_lon": FLOAT,
+    u"shape_pt_lat": FLOAT,
+    u"shape_pt_lon": FLOAT,
+    u"shape_dist_traveled": FLOAT,
+    u"stop_sequence": INT16,
+    u"shape_pt_sequence": INT16,
+    u"route_type": INT16,
+    u"pickup_type": INT8,
+    u"drop_off_type": INT8,
+    u"direction_id": INT8,
+    u"exception_type": INT8,
+    u"monday": INT8,
+    u"tuesday": INT8,
+    u"wednesday": INT8,
+    u"thursday": INT8,
+    u"friday": INT8,
+    u"saturday": INT8,
+    u"sunday": INT8,
+    }
+
+UTF8_BOM = "\xef\xbb\xbf"
+
+
+def schema(keys):
+    """ Returns the (column, kind) pairs for a list of GTFS keys """
+    return [(key, COLUMN_KINDS.get(key, TEXT)) for key in keys]
+
+
+SCHEMAS = {
+    GtfsProviderCsv.AGENCY_FILE: schema(models.AGENCY_KEYS),
+    GtfsProviderCsv.CALENDAR_DATES_FILE: schema(models.CALENDAR_DATES_KEYS),
+    GtfsProviderCsv.CALENDAR_FILE: schema(models.CALENDAR_KEYS),
+    GtfsProviderCsv.SHAPES_FILE: schema(models.SHAPES_KEYS),
+    GtfsProviderCsv.STOPS_FILE: schema(models.STOPS_KEYS),
+    GtfsProviderCsv.ROUTES_FILE: schema(models.ROUTES_KEYS),
+    GtfsProviderCsv.STOP_TIMES_FILE: schema(models.STOP_TIMES_KEYS),
+    GtfsProviderCsv.TRIPS_FILE: schema(models.TRIPS_KEYS),
+    }
+
+
+class ColumnTable(object):
+    """ A GTFS table as NumPy columns of equal length, in schema order.
+        ID and TEXT columns hold codes into the IdTable of the same
+        name in dictionaries. """
+
+    def __init__(self, names, columns, dictionaries):
+        self.names = names
+        self.columns = columns
+        self.dictionaries = dictionaries
+
+    def __len__(self):
+        if not self.names:
+            return 0
+        return len(self.columns[self.names[0]])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def decode(self, name):
+        """ returns the values of an encoded column as a list of
+            unicode strings, with None for missing values """
+        values = self.dictionaries[name].values
+        return [values[code] if code >= 0 else None
+                for code in self.columns[name].tolist()]
+
+    def nbytes(self):
+        """ bytes held by the columns, not counting the dictionaries """
+        return sum(column.nbytes for column in self.columns.itervalues())
+
+
+def _seconds(value):
+    """ converts HH:MM:SS to seconds after midnight """
+    if not value:
+        return MISSING
+    hours, minutes, seconds = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def _integer(value):
+    """ converts an integer or YYYYMMDD date """
+    return int(value) if value else MISSING
+
+
+def _float(value):
+    """ converts a float, with NaN for a missing value """
+    return float(value) if value else numpy.nan
+
+
+def _converter(kind, dictionary):
+    """ returns the function converting a raw value of a kind """
+    if kind in (ID, TEXT):
+        code = dictionary.code
+        return lambda value: code(value) if value else MISSING
+    if kind == TIME:
+        return _seconds
+    if kind == FLOAT:
+        return _float
+    return _integer
+
+
+def read_columns(lines, table_schema, dictionaries=None, header=None):
+    """ Parses csv lines (utf-8 byte strings, e.g. an open file) into a
+        ColumnTable. The first line is the header unless one is given as
+        a list of column names. Columns of the schema missing from the
+        file are filled with missing values; others are ignored. Encoded
+        columns use the IdTable given for them in dictionaries (e.g. the
+        tables of an IdInterner), or else a new one. New tables for ID
+        columns are added to dictionaries, so that the next table read
+        with it shares their codes. Raises ValueError for a value that
+        does not fit its column. """
+    reader = csv.reader(lines)
+    if header is None:
+        header = next(reader, [])
+    header = list(header)
+    if header and header[0].startswith(UTF8_BOM):
+        header[0] = header[0][len(UTF8_BOM):]
+    positions = dict((name.strip(), i) for i, name in enumerate(header))
+
+    if dictionaries is None:
+        dictionaries = {}
+    names = []
+    buffers = {}
+    plan = []
+    table_dictionaries = {}
+    for name, kind in table_schema:
+        typecode = KIND_TYPES[kind][1]
+        dictionary = None
+        if kind in (ID, TEXT):
+            dictionary = dictionaries.get(name)
+            if dictionary is None:
+                dictionary = IdTable()
+                if kind == ID:
+                    dictionaries[name] = dictionary
+            table_dictionaries[name] = dictionary
+        names.append(name)
+        buffers[name] = array(typecode)
+        plan.append((positions.get(name.encode("utf-8"), -1),
+                     _converter(kind, dictionary),
+                     buffers[name].append))
+
+    for row in reader:
+        if not row:
+            continue
+        try:
+            for position, convert, append in plan:
+                value = row[position] if 0 <= position < len(row) else ""
+                append(convert(value))
+        except (ValueError, OverflowError) as error:
+            raise ValueError("line {0}: {1}".format(reader.line_num, error))
+
+    columns = {}
+    for name, kind in table_schema:
+        dtype = KIND_TYPES[kind][0]
+        values = buffers[name]
+        if values:
+            columns[name] = numpy.frombuffer(values, dtype=dtype)
+        else:
+            columns[name] = numpy.empty(0, dtype=dtype)
+
+    return ColumnTable(names, columns, table_dictionaries)
+
+
+def read_table(csvfile, name, table_schema, dictionaries=None, header=None):
+    """ Reads an open GTFS csv file into a ColumnTable (see
+        read_columns), naming the file in any ValueError raised """
+    try:
+        return read_columns(csvfile, table_schema, dictionaries, header)
+    except ValueError as value_error:
+        raise ValueError("{0}: {1}".format(name, value_error))
+
+
+def load_table(path, table_schema, dictionaries=None):
+    """ Reads a GTFS csv file into a ColumnTable (see read_columns).
+        Raises ValueError if path is incorrect. """
+    if not os.path.exists(path):
+        raise ValueError("{0} is an invalid path".format(path))
+    with open(path, 'rb') as csvfile:
+        return read_table(csvfile, path, table_schema, dictionaries)
+
+
+def merge_tables(parts, table_schema, dictionaries=None):
+    """ Joins ColumnTables read from consecutive parts of one file into
+        one, re-encoding the columns of every part into a single IdTable
+        per column. As in read_columns, ID columns use and extend the
+        tables in dictionaries. """
+    if dictionaries is None:
+        dictionaries = {}
+    names = []
+    columns = {}
+    table_dictionaries = {}
+    for name, kind in table_schema:
+        names.append(name)
+        if kind not in (ID, TEXT):
+            columns[name] = numpy.concatenate([part[name] for part in parts])
+            continue
+
+        target = dictionaries.get(name)
+        if target is None:
+            target = IdTable()
+            if kind == ID:
+                dictionaries[name] = target
+        table_dictionaries[name] = target
+
+        recoded = []
+        for part in parts:
+            # the extra last entry maps MISSING (-1) to itself
+            mapping = numpy.array(
+                [target.intern(value) for value in part.dictionaries[name].values] +
+                [MISSING], dtype=numpy.int32)
+            recoded.append(mapping[part[name]])
+        columns[name] = numpy.concatenate(recoded)
+
+    return ColumnTable(names, columns, table_dictionaries)
+
+
+# size of the byte ranges large files are split into by load_all
+CHUNK_BYTES = 32 * 1024 * 1024
+
+# the provider read by pool workers. It is set before the pool is started
+# so that forked workers inherit it, with anything it holds in memory
+# (such as prefetched zip members), instead of receiving a pickled copy
+# with every task.
+_worker_provider = None
+
+
+def _load_part(task):
+    """ Parses a whole file, or a byte range of one, in a worker """
+    filename, header, span = task
+    provider = _worker_provider
+    if span is None:
+        return provider.load_columns(filename)
+
+    lines = provider.read_gtfs_span(filename, *span).splitlines(True)
+    return read_table(lines, "{0} bytes {1}-{2}".format(filename, *span),
+                      SCHEMAS[filename], header=header)
+
+
+def load_all(provider, workers=None, filenames=None, dictionaries=None,
+             chunk_bytes=None):
+    """ Loads GTFS files of a GtfsProviderCsv (by default every standard
+        file it has) into ColumnTables on a pool of worker processes (one
+        per CPU by default; with workers=1 everything is loaded in this
+        process). Files bigger than chunk_bytes are split into byte
+        ranges on line boundaries that are parsed separately. The column
+        arrays cross back to this process cheaply, and are merged here so
+        that, as for load_columns, ID columns share the codes in
+        dictionaries, which is extended. Workers are forked from this
+        process and read the provider in place, so tasks carry only a
+        file name and byte range. Returns a dict of the tables by file
+        name. Raises ValueError for a missing or malformed file. """
+    global _worker_provider
+
+    if filenames is None:
+        filenames = [filename for filename in provider.GTFS_FILES
+                     if provider.has_gtfs_file(filename)]
+    if chunk_bytes is None:
+        chunk_bytes = CHUNK_BYTES
+    if dictionaries is None:
+        dictionaries = {}
+
+    tasks = []
+    for filename in filenames:
+        if not provider.has_gtfs_file(filename):
+            raise ValueError("{0} is not in the feed".format(filename))
+        split = provider.split_gtfs_file(filename, chunk_bytes)
+        if split is None:
+            tasks.append((filename, None, None))
+        else:
+            header = next(csv.reader([split[0]]))
+            for span in split[1]:
+                tasks.append((filename, header, span))
+
+    _worker_provider = provider
+    try:
+        if workers == 1:
+            parts = map(_load_part, tasks)
+        else:
+            pool = multiprocessing.Pool(workers)
+            try:
+                parts = pool.map(_load_part, tasks)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _worker_provider = None
+
+    tables = {}
+    for filename in filenames:
+        table_parts = [part for task, part in zip(tasks, parts)
+                       if task[0] == filename]
+        tables[filename] = merge_tables(
+            table_parts, SCHEMAS[filename], dictionaries)
+    return tables
+
+
+def stop_time_hops(stop_times):
+    """ Returns the hops between consecutive stops of every trip in a
+        stop_times ColumnTable, as arrays of first stop codes, second
+        stop codes and the seconds from departure to arrival. Hops with
+        a missing time are dropped. """
+    order = numpy.lexsort((stop_times[u"stop_sequence"], stop_times[u"trip_id"]))
+    trips = stop_times[u"trip_id"][order]
+    stops = stop_times[u"stop_id"][order]
+    arrivals = stop_times[u"arrival_time"][order]
+    departures = stop_times[u"departure_time"][order]
+
+    keep = ((trips[1:] == trips[:-1]) &
+            (departures[:-1] >= 0) & (arrivals[1:] >= 0))
+    return (stops[:-1][keep], stops[1:][keep],
+            (arrivals[1:] - departures[:-1])[keep])
+
+
+def stop_graph(stop_times):
+    """ Builds a WeightedDiGraph with a vertex per stop code of a
+        stop_times ColumnTable and an edge for every hop, weighted by the
+        quickest hop time in seconds. The stop_id of each vertex is in
+        vertex_ids. If stop codes were first assigned from stops.txt,
+        with IdInterner.index_stops, vertex i is stop row i. """
+    stop_ids = stop_times.dictionaries[u"stop_id"].values
+    firsts, seconds, times = stop_time_hops(stop_times)
+    return graph_from_arrays(len(stop_ids), firsts, seconds, times,
+                             vertex_ids=list(stop_ids))
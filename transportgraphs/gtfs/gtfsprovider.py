@@ -1,6 +1,10 @@
 """ """
 
+import io
 import os
+import posixpath
+import zipfile
+from multiprocessing.pool import ThreadPool
 import utils.ucsv
 from utils.decorators import CheckPathIsValid
 from abc import ABCMeta, abstractmethod
@@ -8,7 +12,10 @@ from abc import ABCMeta, abstractmethod
 class GtfsProvider(object):
     """ General interface for accessing GTFS. The load_X methods should
         return a list of dictionaries, with the field name as key and
-        field value as value. """
+        field value as value, or None if the file is missing. The iter_X
+        methods return an iterator over the same dictionaries, empty for
+        a missing file; by default they walk the result of load_X, and
+        providers that can stream rows should override them. """
 
     __metaclass__ = ABCMeta
 
@@ -44,18 +51,58 @@ class GtfsProvider(object):
     def load_trips(self):
         pass
 
+    def iter_agency(self):
+        return _iter_loaded(self.load_agency())
+
+    def iter_calendar_dates(self):
+        return _iter_loaded(self.load_calendar_dates())
+
+    def iter_calendar(self):
+        return _iter_loaded(self.load_calendar())
+
+    def iter_shapes(self):
+        return _iter_loaded(self.load_shapes())
+
+    def iter_stops(self):
+        return _iter_loaded(self.load_stops())
+
+    def iter_routes(self):
+        return _iter_loaded(self.load_routes())
+
+    def iter_stop_times(self):
+        return _iter_loaded(self.load_stop_times())
+
+    def iter_trips(self):
+        return _iter_loaded(self.load_trips())
+
+
+def _iter_loaded(rows):
+    """ iterates over the rows returned by a load_X method, of which
+        there are none if it returned None for a missing file """
+    return iter(rows if rows is not None else ())
+
+
+def iter_csv_file(csvfile):
+    """ Yields the rows of an open csv file one at a time, so only the
+        current row is held in memory, and closes the file when done.
+        A leading byte order mark is skipped. """
+    with csvfile:
+        for row in utils.ucsv.UnicodeDictReader(csvfile, encoding="utf-8-sig"):
+            yield row
+
 
 @CheckPathIsValid
+def iter_csv(path):
+    """ Yields the rows of a csv one at a time, so only the current row
+        is held in memory. Throws ValueException if path is incorrect
+        (done in decorator, when called). """
+    return iter_csv_file(open(path, 'rb'))
+
+
 def read_csv(path):
     """ Reads a csv into a list. Throws ValueException if
-        path is incorrect (done in decorator). """
-    content = []
-    with open(path, 'rb') as csvfile:
-        dictreader = utils.ucsv.UnicodeDictReader(csvfile)
-        for row in dictreader:
-            content.append(row)
-
-    return content
+        path is incorrect (done in iter_csv). """
+    return list(iter_csv(path))
 
 
 class GtfsProviderCsv(GtfsProvider):
@@ -72,6 +119,17 @@ class GtfsProviderCsv(GtfsProvider):
     STOP_TIMES_FILE = "stop_times.txt"
     TRIPS_FILE = "trips.txt"
 
+    GTFS_FILES = (
+        AGENCY_FILE,
+        CALENDAR_DATES_FILE,
+        CALENDAR_FILE,
+        SHAPES_FILE,
+        STOPS_FILE,
+        ROUTES_FILE,
+        STOP_TIMES_FILE,
+        TRIPS_FILE
+        )
+
     def __init__(self, directory):
         self.directory = directory
 
@@ -107,11 +165,129 @@ class GtfsProviderCsv(GtfsProvider):
         """ Loads trips file to a list. """
         return self.load_gtfs_file(self.directory, self.TRIPS_FILE)
 
+    def iter_agency(self):
+        """ Iterates over the rows of the agency file. """
+        return self.iter_gtfs_file(self.AGENCY_FILE)
+
+    def iter_calendar_dates(self):
+        """ Iterates over the rows of the calendar_dates file. """
+        return self.iter_gtfs_file(self.CALENDAR_DATES_FILE)
+
+    def iter_calendar(self):
+        """ Iterates over the rows of the calendar file. """
+        return self.iter_gtfs_file(self.CALENDAR_FILE)
+
+    def iter_shapes(self):
+        """ Iterates over the rows of the shapes file. """
+        return self.iter_gtfs_file(self.SHAPES_FILE)
+
+    def iter_stops(self):
+        """ Iterates over the rows of the stops file. """
+        return self.iter_gtfs_file(self.STOPS_FILE)
+
+    def iter_routes(self):
+        """ Iterates over the rows of the routes file. """
+        return self.iter_gtfs_file(self.ROUTES_FILE)
+
+    def iter_stop_times(self):
+        """ Iterates over the rows of the stop_times file. """
+        return self.iter_gtfs_file(self.STOP_TIMES_FILE)
+
+    def iter_trips(self):
+        """ Iterates over the rows of the trips file. """
+        return self.iter_gtfs_file(self.TRIPS_FILE)
+
+    def open_gtfs_file(self, filename):
+        """ Opens a GTFS file for reading in binary mode. Every load
+            goes through here, so other sources only need to override
+            it. Raises ValueError if the file is missing. """
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path):
+            raise ValueError("{0} is an invalid path".format(path))
+        return open(path, 'rb')
+
+    def has_gtfs_file(self, filename):
+        """ True if the feed has the given file """
+        return os.path.exists(os.path.join(self.directory, filename))
+
+    def stamp_gtfs_file(self, filename):
+        """ Returns the (size, modification time) of a GTFS file, for
+            telling when it changes """
+        info = os.stat(os.path.join(self.directory, filename))
+        return info.st_size, info.st_mtime
+
+    def split_gtfs_file(self, filename, chunk_bytes):
+        """ Splits a GTFS file into byte ranges of about chunk_bytes that
+            start and end on line boundaries, so that they can be parsed
+            separately; fields must not contain line breaks, as is the
+            case for GTFS. Returns the raw header line and a list of
+            (start, end) offsets, or None if the file is not worth
+            splitting. """
+        path = os.path.join(self.directory, filename)
+        size = os.path.getsize(path)
+        if size <= chunk_bytes:
+            return None
+
+        spans = []
+        with open(path, 'rb') as the_file:
+            header = the_file.readline()
+            start = the_file.tell()
+            while start < size:
+                end = start + chunk_bytes
+                if end < size:
+                    the_file.seek(end)
+                    the_file.readline()
+                    end = the_file.tell()
+                else:
+                    end = size
+                spans.append((start, end))
+                start = end
+        return header, spans
+
+    def read_gtfs_span(self, filename, start, end):
+        """ Returns the raw bytes of a GTFS file from start to end """
+        with open(os.path.join(self.directory, filename), 'rb') as the_file:
+            the_file.seek(start)
+            return the_file.read(end - start)
+
+    def load_all(self, workers=None, filenames=None, dictionaries=None,
+                 chunk_bytes=None):
+        """ Loads every GTFS file of the feed, or those in filenames,
+            into ColumnTables in parallel on a pool of worker processes,
+            with large files split into line-aligned byte ranges (see
+            gtfs.columnar.load_all). Returns a dict of the tables by
+            file name. """
+        # imported here as only the columnar mode needs NumPy
+        import columnar
+        return columnar.load_all(self, workers, filenames, dictionaries,
+                                 chunk_bytes)
+
+    def iter_gtfs_file(self, filename):
+        """ Iterates over the rows of a GTFS file, reading them as they
+            are needed. A missing file is reported and yields no rows. """
+        try:
+            return iter_csv_file(self.open_gtfs_file(filename))
+        except ValueError as value_error:
+            print value_error
+
+        return iter(())
+
+    def load_columns(self, filename, dictionaries=None):
+        """ Loads a GTFS file into a gtfs.columnar.ColumnTable of typed
+            NumPy columns, e.g. load_columns(self.STOP_TIMES_FILE).
+            dictionaries, such as the tables of a gtfs.interning
+            IdInterner, is passed on to share id codes between tables.
+            Raises ValueError if the file is missing or malformed. """
+        # imported here as only the columnar mode needs NumPy
+        import columnar
+        with self.open_gtfs_file(filename) as csvfile:
+            return columnar.read_table(
+                csvfile, filename, columnar.SCHEMAS[filename], dictionaries)
+
     def load_gtfs_file(self, directory, filename):
         """ Loads a GTFS file into a list """
         try:
-            filepath = os.path.join(self.directory, filename)
-            return read_csv(filepath)
+            return list(iter_csv_file(self.open_gtfs_file(filename)))
         except ValueError as value_error:
             print value_error
         except Exception as exeption:
@@ -120,6 +296,108 @@ class GtfsProviderCsv(GtfsProvider):
         return None
 
 
+class GtfsProviderZip(GtfsProviderCsv):
+    """ Implementation of GtfsProvider that reads the files straight
+        out of a zip archive, as feeds are published, decompressing each
+        member as it is read rather than extracting it. Members may be
+        in a folder inside the archive. """
+
+    def __init__(self, archive_path):
+        super(GtfsProviderZip, self).__init__(archive_path)
+        self.archive_path = archive_path
+        self.prefetched = {}
+        self._members = None
+
+    def members(self):
+        """ Maps each file name to its member name in the archive,
+            preferring the member nearest the top. Raises ValueError
+            if the archive is missing or not a zip file. """
+        if self._members is None:
+            if not zipfile.is_zipfile(self.archive_path):
+                raise ValueError(
+                    "{0} is not a zip archive".format(self.archive_path))
+            archive = zipfile.ZipFile(self.archive_path)
+            try:
+                names = archive.namelist()
+            finally:
+                archive.close()
+
+            members = {}
+            for name in sorted(names, key=lambda name: -name.count("/")):
+                if not name.endswith("/"):
+                    members[posixpath.basename(name)] = name
+            self._members = members
+        return self._members
+
+    def has_gtfs_file(self, filename):
+        """ True if the archive has the given file """
+        return filename in self.prefetched or filename in self.members()
+
+    def stamp_gtfs_file(self, filename):
+        """ Returns the uncompressed size of a member and its
+            modification time and CRC-32 as recorded in the archive.
+            Archives built reproducibly give every member the same fixed
+            time, so the CRC is what tells a changed member apart. """
+        archive = zipfile.ZipFile(self.archive_path)
+        try:
+            info = archive.getinfo(self.members()[filename])
+        finally:
+            archive.close()
+        return info.file_size, "{0:04}-{1:02}-{2:02}T{3:02}:{4:02}:{5:02} {6:08x}".format(
+            *(info.date_time + (info.CRC,)))
+
+    def split_gtfs_file(self, filename, chunk_bytes):
+        """ Members can only be read from the start, so are never split """
+        return None
+
+    def open_gtfs_file(self, filename):
+        """ Opens a member for streaming decompression, or returns its
+            prefetched content. Raises ValueError if it is missing. """
+        if filename in self.prefetched:
+            return io.BytesIO(self.prefetched[filename])
+
+        members = self.members()
+        if filename not in members:
+            raise ValueError("{0} is not in {1}".format(
+                filename, self.archive_path))
+        archive = zipfile.ZipFile(self.archive_path)
+        try:
+            # a ZipFile opened by path gives each member its own file
+            # handle, so the member outlives the archive object and
+            # several can be read at once from different threads
+            return archive.open(members[filename])
+        finally:
+            archive.close()
+
+    def _read_member(self, filename):
+        """ returns the decompressed content of a member """
+        with self.open_gtfs_file(filename) as member:
+            return member.read()
+
+    def prefetch(self, filenames=None, workers=None):
+        """ Decompresses members on a pool of worker threads, as zlib
+            releases the GIL, and keeps their content in memory for the
+            loads that follow. filenames defaults to every standard GTFS
+            file in the archive. Raises ValueError for a missing one. """
+        if filenames is None:
+            filenames = [filename for filename in self.GTFS_FILES
+                         if self.has_gtfs_file(filename)]
+        filenames = [filename for filename in filenames
+                     if filename not in self.prefetched]
+
+        pool = ThreadPool(workers)
+        try:
+            contents = pool.map(self._read_member, filenames)
+        finally:
+            pool.close()
+            pool.join()
+        self.prefetched.update(zip(filenames, contents))
+
+    def clear_prefetched(self):
+        """ Forgets prefetched content, going back to streaming """
+        self.prefetched = {}
+
+
 class GtfsProviderSingleRowMock(GtfsProvider):
     """ Returns a single valid row of data. Doesn't need to go to
         filesystem """
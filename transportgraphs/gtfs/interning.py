@@ -0,0 +1,107 @@
+"""
+interning.py
+
+Dictionary encoding of GTFS string ids. Each id namespace (stop_id,
+trip_id...) gets an IdTable assigning dense ints to its ids in order of
+first appearance, so that joins and graph builders can work on ints and
+graph vertices can map 1:1 to stops.
+"""
+
+ID_NAMESPACES = (
+    u"stop_id",
+    u"trip_id",
+    u"route_id",
+    u"service_id",
+    u"shape_id"
+    )
+
+MISSING = -1
+
+
+class IdTable(object):
+    """ Bidirectional mapping between the distinct values of one
+        namespace and dense int codes. Codes are kept against the utf-8
+        encoded value, as read from a csv; values holds the unicode value
+        of each code. """
+
+    def __init__(self, values=()):
+        self.codes = {}
+        self.values = []
+        for value in values:
+            self.intern(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, value):
+        return value.encode("utf-8") in self.codes
+
+    def code(self, raw):
+        """ returns the code of a utf-8 string, adding it if new """
+        code = self.codes.get(raw)
+        if code is None:
+            code = len(self.values)
+            self.codes[raw] = code
+            self.values.append(raw.decode("utf-8"))
+        return code
+
+    def intern(self, value):
+        """ returns the code of a unicode value, adding it if new """
+        return self.code(value.encode("utf-8"))
+
+    def lookup(self, value):
+        """ returns the code of a unicode value, or MISSING """
+        return self.codes.get(value.encode("utf-8"), MISSING)
+
+    def value(self, code):
+        """ returns the unicode value of a code """
+        return self.values[code]
+
+
+class IdInterner(object):
+    """ One IdTable per id namespace, shared by every table interned
+        through it so that, e.g., stop_id codes agree between stops and
+        stop_times. tables can be passed as the dictionaries of
+        GtfsProviderCsv.load_columns. """
+
+    def __init__(self, namespaces=ID_NAMESPACES):
+        self.tables = dict((namespace, IdTable()) for namespace in namespaces)
+
+    def __getitem__(self, namespace):
+        return self.tables[namespace]
+
+    def intern(self, namespace, value):
+        """ returns the code of a value in a namespace, adding it if new """
+        return self.tables[namespace].intern(value)
+
+    def lookup(self, namespace, value):
+        """ returns the code of a value in a namespace, or MISSING """
+        return self.tables[namespace].lookup(value)
+
+    def value(self, namespace, code):
+        """ returns the value of a code in a namespace """
+        return self.tables[namespace].value(code)
+
+    def intern_row(self, row):
+        """ returns a copy of a row dict with the values of its id keys
+            replaced by their codes; empty ids become MISSING """
+        interned = dict(row)
+        for namespace, table in self.tables.iteritems():
+            value = row.get(namespace)
+            if value is not None:
+                interned[namespace] = table.intern(value) if value else MISSING
+        return interned
+
+    def intern_rows(self, rows):
+        """ yields intern_row of each row, e.g. of GtfsProvider.iter_X """
+        for row in rows:
+            yield self.intern_row(row)
+
+    def index_stops(self, stops):
+        """ interns the stop_id of each stop row in order, so that stop
+            code i is the stop in position i, as in stop_coordinates.
+            Returns the list of stop_ids, for use as vertex_ids. """
+        table = self.tables[u"stop_id"]
+        for stop in stops:
+            table.intern(stop[u"stop_id"])
+        return table.values
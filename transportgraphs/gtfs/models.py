@@ -76,19 +76,93 @@ TRIPS_KEYS = [
 
 class GtfsObject(object):
     """ Base class for Gtfs Objects. Contains
-        common functionality between the objects. """
+        common functionality between the objects. Derived classes set
+        required_keys; the values of a row are held in a tuple in that
+        order, with slots rather than a per-object dict, and the hash of
+        unique_id is computed once, when first needed. Any other keys of
+        the row, such as optional GTFS columns, are kept in a dict of
+        extras, which is None for rows without any. """
 
-    def __init__(self, required_keys, data_dict):
-        self.required_keys = required_keys
-        self.data = data_dict
+    __slots__ = ("values", "extras", "valid", "_hash")
+
+    required_keys = []
+    _positions = {}
+
+    def __init__(self, data_dict):
+        keys = self.required_keys
+        values = tuple([data_dict.get(key) for key in keys])
+        self.values = values
+        self.extras = None
+        if len(data_dict) > len(keys) or None in values:
+            positions = self._positions
+            extras = dict((key, value) for key, value in data_dict.iteritems()
+                          if key not in positions)
+            if extras:
+                self.extras = extras
+        self.valid = len(data_dict) == len(keys) and (
+            None not in values or all(key in data_dict for key in keys))
+        self._hash = None
+
+    @classmethod
+    def from_values(cls, values):
+        """ Creates a valid object from a tuple of values given in
+            required_keys order, without checking them """
+        instance = cls.__new__(cls)
+        instance.values = values
+        instance.extras = None
+        instance.valid = True
+        instance._hash = None
+        return instance
+
+    @classmethod
+    def validate_many(cls, rows):
+        """ Creates an object from each row dict of one file. As every
+            row of a csv has the same header only the keys of the first
+            row are checked: raises ValueError if they are not the
+            required keys. A later row missing some of the keys, as
+            a short line of the csv gives, makes an invalid object, as
+            the constructor would. Returns a list of the objects. """
+        keys = cls.required_keys
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return []
+        if set(first) != set(keys):
+            raise ValueError("{0} rows need the keys {1}, not {2}".format(
+                cls.__name__, sorted(keys), sorted(first)))
+
+        from_values = cls.from_values
+        objects = [from_values(tuple([first[key] for key in keys]))]
+        for row in rows:
+            values = tuple([row.get(key) for key in keys])
+            instance = from_values(values)
+            if None in values:
+                instance.valid = False
+            objects.append(instance)
+        return objects
+
+    @property
+    def data(self):
+        """ The row as a dict, with the keys it was created from """
+        data = dict((key, value) for key, value
+                    in zip(self.required_keys, self.values)
+                    if value is not None)
+        if self.extras:
+            data.update(self.extras)
+        return data
 
     def get(self, key):
         """ Gets a value stored at a given key in the object """
-        return self.data.get(key, None)
+        position = self._positions.get(key)
+        if position is None:
+            if self.extras:
+                return self.extras.get(key)
+            return None
+        return self.values[position]
 
     def is_valid(self):
         """ Validates object """
-        return set(self.required_keys) == set(self.data.keys())
+        return self.valid
 
     def unique_id(self):
         """ Returns a unique key for this object.
@@ -99,16 +173,38 @@ class GtfsObject(object):
 
     def __eq__(self, other):
         """ Basing equality on id """
+        if not isinstance(other, GtfsObject):
+            return NotImplemented
         return self.unique_id() == other.unique_id()
 
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __hash__(self):
+        """ Hash of unique_id, cached """
+        if self._hash is None:
+            self._hash = hash(self.unique_id())
+        return self._hash
+
     def __str__(self):
         return unicode(self).encode(UTF8)
 
 
+def _key_positions(keys):
+    """ maps each key to its position in a values tuple """
+    return dict((key, i) for i, key in enumerate(keys))
+
+
 class Route(GtfsObject):
     """ Corresponds to a single row in the route dataset """
-    def __init__(self, data_dict):
-        super(Route, self).__init__(ROUTES_KEYS, data_dict)
+
+    __slots__ = ()
+
+    required_keys = ROUTES_KEYS
+    _positions = _key_positions(ROUTES_KEYS)
 
     def get_route_id(self):
         return self.get(u"route_id")
@@ -139,8 +235,10 @@ class Route(GtfsObject):
 class TripElement(GtfsObject):
     """ Corresponds to a single row in the trips dataset """
 
-    def __init__(self, data_dict):
-        super(TripElement, self).__init__(TRIPS_KEYS, data_dict)
+    __slots__ = ()
+
+    required_keys = TRIPS_KEYS
+    _positions = _key_positions(TRIPS_KEYS)
 
     def get_route_id(self):
         return self.get(u"route_id")
@@ -179,8 +277,10 @@ class TripElement(GtfsObject):
 class Stop(GtfsObject):
     """ Corresponds to a single row in the stops dataset """
 
-    def __init__(self, data_dict):
-        super(Stop, self).__init__(STOPS_KEYS, data_dict)
+    __slots__ = ()
+
+    required_keys = STOPS_KEYS
+    _positions = _key_positions(STOPS_KEYS)
 
     def get_stop_id(self):
         return self.get(u"stop_id")
@@ -210,8 +310,11 @@ class Stop(GtfsObject):
 
 class StopTime(GtfsObject):
     """ Corresponds to a single row in the stop_times dataset """
-    def __init__(self, data_dict):
-        super(StopTime, self).__init__(STOP_TIMES_KEYS, data_dict)
+
+    __slots__ = ()
+
+    required_keys = STOP_TIMES_KEYS
+    _positions = _key_positions(STOP_TIMES_KEYS)
 
     def get_trip_id(self):
         return self.get(u"trip_id")
@@ -263,29 +366,51 @@ class StopTime(GtfsObject):
 
 class Agency(GtfsObject):
     """ Represents an element in the agency dataset """
+
+    __slots__ = ()
+
+    required_keys = AGENCY_KEYS
+    _positions = _key_positions(AGENCY_KEYS)
+
     def __init__(self, data_dict):
-        super(Agency, self).__init__(AGENCY_KEYS, data_dict)
+        super(Agency, self).__init__(data_dict)
         raise NotImplementedError()
 
 
 class CalenderElement(GtfsObject):
     """ Represents an element in the calendar dataset """
+
+    __slots__ = ()
+
+    required_keys = CALENDAR_KEYS
+    _positions = _key_positions(CALENDAR_KEYS)
+
     def __init__(self, data_dict):
-        super(Agency, self).__init__(CALENDAR_KEYS, data_dict)
+        super(CalenderElement, self).__init__(data_dict)
         raise NotImplementedError()
 
 
 class CalenderDatesElement(GtfsObject):
     """ Represents an element in the calendar dates dataset """
+
+    __slots__ = ()
+
+    required_keys = CALENDAR_DATES_KEYS
+    _positions = _key_positions(CALENDAR_DATES_KEYS)
+
     def __init__(self, data_dict):
-        super(CalenderDatesElement, self).__init__(CALENDAR_DATES_KEYS, data_dict)
+        super(CalenderDatesElement, self).__init__(data_dict)
         raise NotImplementedError()
 
 
 class Shape(GtfsObject):
     """ Represents an element in the shapes dataset """
-    def __init__(self, data_dict):
-        super(Shape, self).__init__(SHAPES_KEYS, data_dict)
-        raise NotImplementedError()
 
+    __slots__ = ()
 
+    required_keys = SHAPES_KEYS
+    _positions = _key_positions(SHAPES_KEYS)
+
+    def __init__(self, data_dict):
+        super(Shape, self).__init__(data_dict)
+        raise NotImplementedError()
@@ -0,0 +1,271 @@
+"""
+sqliteprovider.py
+
+A GtfsProvider over a feed imported once into a SQLite database, with
+indexes for the lookups services make most often, so that a slice of
+the feed can be read without loading all of it.
+"""
+
+import sqlite3
+import models
+from gtfsprovider import GtfsProvider
+from gtfsprovider import GtfsProviderCsv
+
+# table name and key list of each GTFS file; a table gets a further
+# TEXT column for each other column found in the feed
+TABLES = (
+    (GtfsProviderCsv.AGENCY_FILE, "agency", models.AGENCY_KEYS),
+    (GtfsProviderCsv.CALENDAR_DATES_FILE, "calendar_dates", models.CALENDAR_DATES_KEYS),
+    (GtfsProviderCsv.CALENDAR_FILE, "calendar", models.CALENDAR_KEYS),
+    (GtfsProviderCsv.SHAPES_FILE, "shapes", models.SHAPES_KEYS),
+    (GtfsProviderCsv.STOPS_FILE, "stops", models.STOPS_KEYS),
+    (GtfsProviderCsv.ROUTES_FILE, "routes", models.ROUTES_KEYS),
+    (GtfsProviderCsv.STOP_TIMES_FILE, "stop_times", models.STOP_TIMES_KEYS),
+    (GtfsProviderCsv.TRIPS_FILE, "trips", models.TRIPS_KEYS),
+    )
+
+# columns added to stop_times, derived from the text values, for
+# ordering and range queries
+STOP_TIMES_EXTRA_COLUMNS = (
+    ("arrival_seconds", "INTEGER"),
+    ("departure_seconds", "INTEGER"),
+    ("sequence", "INTEGER"),
+    )
+
+INDEXES = (
+    "CREATE INDEX stop_times_trip ON stop_times (trip_id, sequence)",
+    "CREATE INDEX stop_times_stop ON stop_times (stop_id, departure_seconds)",
+    "CREATE INDEX trips_route ON trips (route_id)",
+    "CREATE INDEX calendar_dates_date ON calendar_dates (date)",
+    "CREATE INDEX stops_id ON stops (stop_id)",
+    )
+
+# rows inserted per executemany call while importing
+BATCH_SIZE = 10000
+
+
+def time_to_seconds(value):
+    """ Converts an HH:MM:SS time, which may pass 24:00:00, to seconds
+        after midnight. Integers are returned as they are; an empty
+        value gives None. """
+    if isinstance(value, (int, long)):
+        return value
+    if not value:
+        return None
+    hours, minutes, seconds = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def _quote(name):
+    """ quotes a column name taken from a feed header """
+    return u'"{0}"'.format(name.replace(u'"', u'""'))
+
+
+def _column(name, kind):
+    """ column definition for CREATE TABLE or ALTER TABLE """
+    return u"{0} {1}".format(_quote(name), kind)
+
+
+def _integer(value):
+    """ converts an integer value, with None for an empty one """
+    return int(value) if value else None
+
+
+class GtfsProviderSqlite(GtfsProvider):
+    """ Implementation of GtfsProvider that reads from a SQLite database
+        made by import_feed. Values are stored as the text read from the
+        feed, optional columns included, so load_X returns the same rows
+        as the provider imported from; columns absent from a row are
+        left out of it.
+        stop_times also holds arrival and departure times in seconds and
+        the stop sequence as an integer. """
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        self.connection = sqlite3.connect(database_path)
+        self._columns = {}
+
+    @classmethod
+    def import_feed(cls, provider, database_path, batch_size=BATCH_SIZE):
+        """ Copies every file of a feed, streamed through the iter_X
+            methods of provider, into a SQLite database at database_path,
+            replacing any feed already there, and builds the indexes.
+            Each table has the columns of its model keys and any other
+            column found in the feed. Returns a GtfsProviderSqlite over
+            the database. """
+        sqlite = cls(database_path)
+        connection = sqlite.connection
+        with connection:
+            for _, table, keys in TABLES:
+                columns = [_column(key, "TEXT") for key in keys]
+                if table == "stop_times":
+                    columns.extend(_column(*column)
+                                   for column in STOP_TIMES_EXTRA_COLUMNS)
+                connection.execute("DROP TABLE IF EXISTS {0}".format(table))
+                connection.execute("CREATE TABLE {0} ({1})".format(
+                    table, ", ".join(columns)))
+                sqlite._insert(table, list(keys),
+                               getattr(provider, "iter_" + table)(), batch_size)
+                sqlite._columns.pop(table, None)
+
+            for index in INDEXES:
+                connection.execute(index)
+        connection.execute("ANALYZE")
+        return sqlite
+
+    def _insert(self, table, keys, rows, batch_size):
+        """ inserts rows, a batch at a time. A key not yet among keys
+            is added to the table as a TEXT column before its row is
+            inserted. """
+        batch = []
+        statement = None
+        for row in rows:
+            extra = sorted(key for key in row if key not in keys)
+            if extra or statement is None:
+                if batch:
+                    self.connection.executemany(statement, batch)
+                    batch = []
+                for key in extra:
+                    self.connection.execute("ALTER TABLE {0} ADD COLUMN {1}".format(
+                        table, _column(key, "TEXT")))
+                keys.extend(extra)
+                statement = self._insert_statement(table, keys)
+
+            values = [row.get(key) for key in keys]
+            if table == "stop_times":
+                values.append(time_to_seconds(row.get(u"arrival_time")))
+                values.append(time_to_seconds(row.get(u"departure_time")))
+                values.append(_integer(row.get(u"stop_sequence")))
+            batch.append(values)
+            if len(batch) >= batch_size:
+                self.connection.executemany(statement, batch)
+                batch = []
+        if batch:
+            self.connection.executemany(statement, batch)
+
+    @staticmethod
+    def _insert_statement(table, keys):
+        """ INSERT statement for the given keys of a table """
+        columns = list(keys)
+        if table == "stop_times":
+            columns.extend(column for column, _ in STOP_TIMES_EXTRA_COLUMNS)
+        return "INSERT INTO {0} ({1}) VALUES ({2})".format(
+            table, ", ".join(_quote(column) for column in columns),
+            ", ".join("?" * len(columns)))
+
+    def columns(self, table):
+        """ Returns the GTFS keys stored in a table, as read from the
+            database, leaving out the derived stop_times columns """
+        if table not in self._columns:
+            derived = set(column for column, _ in STOP_TIMES_EXTRA_COLUMNS)
+            info = self.connection.execute(
+                "PRAGMA table_info({0})".format(table)).fetchall()
+            self._columns[table] = [
+                column[1] for column in info
+                if table != "stop_times" or column[1] not in derived]
+        return self._columns[table]
+
+    def _rows(self, table, where="", parameters=()):
+        """ yields the rows of a table as dicts of its GTFS keys,
+            leaving out NULL values """
+        keys = self.columns(table)
+        cursor = self.connection.execute("SELECT {0} FROM {1} {2}".format(
+            ", ".join(_quote(key) for key in keys), table, where), parameters)
+        for values in cursor:
+            yield dict((key, value) for key, value in zip(keys, values)
+                       if value is not None)
+
+    def close(self):
+        """ Closes the database connection """
+        self.connection.close()
+
+    def departures_at_stop(self, stop_id, start, end):
+        """ Returns the stop_times rows at a stop departing from start up
+            to, but not including, end, in order of departure. start and
+            end are HH:MM:SS times or seconds after midnight. """
+        return list(self._rows(
+            "stop_times",
+            "WHERE stop_id = ? AND departure_seconds >= ? AND "
+            "departure_seconds < ? ORDER BY departure_seconds",
+            (stop_id, time_to_seconds(start), time_to_seconds(end))))
+
+    def stop_sequence_of_trip(self, trip_id):
+        """ Returns the stop_times rows of a trip in stop sequence """
+        return list(self._rows(
+            "stop_times", "WHERE trip_id = ? ORDER BY sequence", (trip_id,)))
+
+    def trips_of_route(self, route_id):
+        """ Returns the trips rows of a route """
+        return list(self._rows("trips", "WHERE route_id = ?", (route_id,)))
+
+    def calendar_dates_on(self, date):
+        """ Returns the calendar_dates rows for a YYYYMMDD date """
+        return list(self._rows("calendar_dates", "WHERE date = ?", (date,)))
+
+    def get_stop(self, stop_id):
+        """ Returns the stops row of a stop, or None """
+        return next(self._rows("stops", "WHERE stop_id = ?", (stop_id,)), None)
+
+    def load_agency(self):
+        """ Loads agency table to a list. """
+        return list(self.iter_agency())
+
+    def load_calendar_dates(self):
+        """ Loads calendar_dates table to a list. """
+        return list(self.iter_calendar_dates())
+
+    def load_calendar(self):
+        """ Loads calendar table to a list. """
+        return list(self.iter_calendar())
+
+    def load_shapes(self):
+        """ Loads shapes table to a list. """
+        return list(self.iter_shapes())
+
+    def load_stops(self):
+        """ Loads stops table to a list. """
+        return list(self.iter_stops())
+
+    def load_routes(self):
+        """ Loads routes table to a list. """
+        return list(self.iter_routes())
+
+    def load_stop_times(self):
+        """ Loads stop_times table to a list. """
+        return list(self.iter_stop_times())
+
+    def load_trips(self):
+        """ Loads trips table to a list. """
+        return list(self.iter_trips())
+
+    def iter_agency(self):
+        """ Iterates over the rows of the agency table. """
+        return self._rows("agency")
+
+    def iter_calendar_dates(self):
+        """ Iterates over the rows of the calendar_dates table. """
+        return self._rows("calendar_dates")
+
+    def iter_calendar(self):
+        """ Iterates over the rows of the calendar table. """
+        return self._rows("calendar")
+
+    def iter_shapes(self):
+        """ Iterates over the rows of the shapes table. """
+        return self._rows("shapes")
+
+    def iter_stops(self):
+        """ Iterates over the rows of the stops table. """
+        return self._rows("stops")
+
+    def iter_routes(self):
+        """ Iterates over the rows of the routes table. """
+        return self._rows("routes")
+
+    def iter_stop_times(self):
+        """ Iterates over the rows of the stop_times table. """
+        return self._rows("stop_times")
+
+    def iter_trips(self):
+        """ Iterates over the rows of the trips table. """
+        return self._rows("trips")
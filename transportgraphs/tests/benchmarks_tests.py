@@ -0,0 +1,60 @@
+from benchmarks.generators import grid_graph
+from benchmarks.generators import random_geometric_graph
+from benchmarks.generators import scale_free_graph
+from benchmarks.run import run_benchmarks
+from benchmarks.run import summarise
+from graphs.graphs import WeightedDiGraph
+
+
+class TestGenerators(object):
+    """ Unit tests for the benchmark network generators """
+
+    def check(self, generator, n_vertices):
+        """ The generator is repeatable for a seed and builds a graph """
+        first = generator(n_vertices, seed=3)
+        assert first == generator(n_vertices, seed=3)
+        assert first != generator(n_vertices, seed=4)
+
+        size, edges = first
+        graph = WeightedDiGraph(size, edges)
+        assert graph.get_edge_count() > 0
+        return size, graph
+
+    def test_grid(self):
+        """ A 10 x 10 grid has 4 * 10 * 9 directed edges """
+        size, graph = self.check(grid_graph, 100)
+        assert size == 100
+        assert graph.get_edge_count() == 360
+
+    def test_geometric(self):
+        """ Geometric graphs have about the mean degree asked for """
+        size, graph = self.check(random_geometric_graph, 2000)
+        assert size == 2000
+        assert 4 < graph.get_edge_count() / float(size) < 8
+
+    def test_scale_free(self):
+        """ Scale-free graphs have edges_per_vertex edges each way
+            for every vertex added """
+        size, graph = self.check(scale_free_graph, 500)
+        assert size == 500
+        assert graph.get_edge_count() == 2 * 3 * (500 - 3)
+
+
+class TestRunBenchmarks(object):
+    """ Unit tests for benchmarks.run """
+
+    def test_summarise(self):
+        """ Median, minimum and mean are computed """
+        summary = summarise([3.0, 1.0, 2.0, 6.0])
+        assert summary == {"runs": 4, "min": 1.0, "median": 2.5, "mean": 3.0}
+
+    def test_report(self):
+        """ Every generator and size gets a result """
+        report = run_benchmarks(["grid", "scale_free"], [100, 400], queries=2,
+                                bellman_ford_limit=100)
+
+        assert len(report["results"]) == 4
+        for result in report["results"]:
+            assert result["dijikstra"]["runs"] == 2
+            assert result["create_path_from_graph"]["runs"] == 2
+            assert (result["bellman_ford"] is None) == (result["vertices"] > 100)
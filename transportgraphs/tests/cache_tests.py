@@ -0,0 +1,89 @@
+from nose.tools import raises
+from graphs.graphs import WeightedDiGraph
+from graphs.graphs import bellman_ford
+from graphs.graphs import SearchContext
+from graphs.cache import ShortestPathCache
+from graphs.cache import estimated_size
+
+
+def example_graph():
+    """ The graph used throughout graphs_tests """
+    edges = [
+        (0, 1, 5),
+        (1, 4, 7),
+        (3, 2, 8),
+        (2, 4, 5),
+        (1, 3, 9),
+        (2, 1, 1),
+        (1, 2, 1)
+        ]
+    return WeightedDiGraph(5, edges)
+
+
+class TestShortestPathCache(object):
+    """ Unit tests for cache.ShortestPathCache """
+
+    def test_paths(self):
+        """ Paths come from the cached tree """
+        cache = ShortestPathCache(example_graph())
+
+        assert str(cache.get_path(0, 4)) == "cost: 11 path: (0, 1, 2, 4)"
+        assert str(cache.get_path(0, 3)) == "cost: 14 path: (0, 1, 3)"
+        assert cache.get_cost(3, 4) == 13
+        assert cache.misses == 2
+        assert cache.hits == 1
+
+    def test_least_recently_used_evicted(self):
+        """ The least recently used source goes first """
+        cache = ShortestPathCache(example_graph(), max_entries=2)
+
+        cache.get_tree(0)
+        cache.get_tree(1)
+        cache.get_tree(0)
+        cache.get_tree(2)
+
+        assert len(cache) == 2
+        assert 0 in cache
+        assert 1 not in cache
+        assert 2 in cache
+
+    def test_memory_budget(self):
+        """ Trees are evicted to keep within the byte budget, and
+            a tree larger than the budget is not kept """
+        graph = example_graph()
+        cache = ShortestPathCache(graph, max_bytes=1)
+        cache.get_tree(0)
+        assert len(cache) == 0
+
+        size = estimated_size(cache.get_tree(0))
+        cache = ShortestPathCache(graph, max_bytes=size + size // 2)
+        cache.get_tree(0)
+        cache.get_tree(1)
+        assert len(cache) == 1
+        assert cache.total_bytes <= cache.max_bytes
+
+    def test_version_change_invalidates(self):
+        """ Cached trees are dropped when the graph changes """
+        graph = example_graph()
+        cache = ShortestPathCache(graph)
+        assert cache.get_cost(0, 4) == 11
+
+        graph.update_edge_weight(2, 4, 1)
+        assert 0 not in cache
+        assert cache.get_cost(0, 4) == 7
+        assert cache.misses == 2
+
+    def test_other_search(self):
+        """ Another algorithm can fill the cache """
+        def search(graph, source):
+            context = SearchContext(graph.vertex_count)
+            bellman_ford(graph, source, context)
+            return context
+
+        cache = ShortestPathCache(example_graph(), search=search)
+        assert str(cache.get_path(0, 4)) == "cost: 11 path: (0, 1, 2, 4)"
+
+    @raises(ValueError)
+    def test_unreachable(self):
+        """ An unreachable target is an error """
+        ShortestPathCache(example_graph()).get_path(3, 0)
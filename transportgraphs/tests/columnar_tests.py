@@ -0,0 +1,289 @@
+import os
+import tempfile
+import zipfile
+import numpy
+from nose.tools import raises
+import gtfs.models as models
+from gtfs.columnar import read_columns
+from gtfs.columnar import schema
+from gtfs.columnar import stop_graph
+from gtfs.columnar import stop_time_hops
+from gtfs.gtfsprovider import GtfsProviderCsv
+from gtfs.gtfsprovider import GtfsProviderZip
+from gtfs.interning import IdInterner
+
+
+class TestLoadColumns(object):
+    """ Tests the columnar loading of GTFS csvs """
+
+    DATA_DIRECTORY = os.path.join(os.path.abspath(os.curdir), "tests/test_data")
+
+    def test_matches_rows(self):
+        """ Every file loads to the same number of rows as load_X """
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        for filename, rows in (
+                (provider.AGENCY_FILE, provider.load_agency()),
+                (provider.CALENDAR_DATES_FILE, provider.load_calendar_dates()),
+                (provider.CALENDAR_FILE, provider.load_calendar()),
+                (provider.SHAPES_FILE, provider.load_shapes()),
+                (provider.STOPS_FILE, provider.load_stops()),
+                (provider.ROUTES_FILE, provider.load_routes()),
+                (provider.STOP_TIMES_FILE, provider.load_stop_times()),
+                (provider.TRIPS_FILE, provider.load_trips())):
+            table = provider.load_columns(filename)
+            assert len(table) == len(rows)
+
+    def test_stop_times_types(self):
+        """ stop_times columns are typed and decode to the csv values """
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        rows = provider.load_stop_times()
+        table = provider.load_columns(provider.STOP_TIMES_FILE)
+
+        assert table.names == models.STOP_TIMES_KEYS
+        assert table[u"arrival_time"].dtype == numpy.int32
+        assert table[u"stop_sequence"].dtype == numpy.int16
+        assert table[u"pickup_type"].dtype == numpy.int8
+        assert table[u"shape_dist_traveled"].dtype == numpy.float64
+        assert table[u"arrival_time"][0] == 16 * 3600 + 15 * 60
+        assert table.decode(u"trip_id") == [row[u"trip_id"] for row in rows]
+        assert table.decode(u"stop_id") == [row[u"stop_id"] for row in rows]
+
+    def test_stops_types(self):
+        """ Coordinates are floats """
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        table = provider.load_columns(provider.STOPS_FILE)
+
+        assert table[u"stop_lat"].dtype == numpy.float64
+        assert abs(table[u"stop_lat"][0] - 53.3522439241978) < 1e-9
+        assert len(table.dictionaries[u"stop_id"]) == len(table)
+
+    def test_shared_dictionaries(self):
+        """ Tables loaded with the same dictionaries share codes """
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        dictionaries = {}
+        stop_times = provider.load_columns(provider.STOP_TIMES_FILE, dictionaries)
+        trips = provider.load_columns(provider.TRIPS_FILE, dictionaries)
+
+        trip_ids = dictionaries[u"trip_id"]
+        code = stop_times[u"trip_id"][0]
+        assert trip_ids.lookup(stop_times.decode(u"trip_id")[0]) == code
+        assert code in trips[u"trip_id"]
+
+    def test_zip_archive(self):
+        """ Columns load from a zip archive as from a directory """
+        handle, filename = tempfile.mkstemp(suffix=".zip")
+        os.close(handle)
+        try:
+            with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.write(os.path.join(self.DATA_DIRECTORY, "stop_times.txt"),
+                              "stop_times.txt")
+            table = GtfsProviderZip(filename).load_columns("stop_times.txt")
+        finally:
+            os.remove(filename)
+
+        expected = GtfsProviderCsv(self.DATA_DIRECTORY).load_columns("stop_times.txt")
+        assert (table[u"departure_time"] == expected[u"departure_time"]).all()
+        assert table.decode(u"stop_id") == expected.decode(u"stop_id")
+
+    @raises(ValueError)
+    def test_missing_file(self):
+        """ A missing file raises ValueError """
+        GtfsProviderCsv("not/a/directory").load_columns(GtfsProviderCsv.STOPS_FILE)
+
+
+class UnpicklableZip(GtfsProviderZip):
+    """ A zip provider that refuses to be pickled """
+
+    def __reduce__(self):
+        raise TypeError("providers are not sent to workers")
+
+
+class TestLoadAll(object):
+    """ Tests the parallel loading of whole feeds """
+
+    DATA_DIRECTORY = TestLoadColumns.DATA_DIRECTORY
+
+    def check(self, tables, provider):
+        """ Each table matches load_columns, and id codes are shared """
+        assert sorted(tables) == sorted(
+            filename for filename in GtfsProviderCsv.GTFS_FILES
+            if provider.has_gtfs_file(filename))
+        for filename, table in tables.iteritems():
+            expected = provider.load_columns(filename)
+            assert table.names == expected.names
+            for name in table.names:
+                if name in table.dictionaries:
+                    assert table.decode(name) == expected.decode(name)
+                else:
+                    assert numpy.array_equal(table[name], expected[name]) or (
+                        numpy.isnan(table[name]) == numpy.isnan(expected[name])).all()
+
+        stop_ids = tables[GtfsProviderCsv.STOPS_FILE].dictionaries[u"stop_id"]
+        assert tables[GtfsProviderCsv.STOP_TIMES_FILE].dictionaries[u"stop_id"] is stop_ids
+        # stops are loaded first, so stop code i is stop row i
+        assert numpy.array_equal(tables[GtfsProviderCsv.STOPS_FILE][u"stop_id"],
+                                 numpy.arange(len(stop_ids)))
+
+    def test_in_process(self):
+        """ workers=1 loads every file in this process """
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        self.check(provider.load_all(workers=1), provider)
+
+    def test_chunks(self):
+        """ Files split into many byte ranges load in order, on a pool """
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        split = provider.split_gtfs_file(provider.STOP_TIMES_FILE, 500)
+        assert len(split[1]) > 3
+        assert split[0].startswith("trip_id,")
+
+        interner = IdInterner()
+        tables = provider.load_all(workers=2, dictionaries=interner.tables,
+                                   chunk_bytes=500)
+        self.check(tables, provider)
+        assert interner[u"trip_id"] is tables[provider.TRIPS_FILE].dictionaries[u"trip_id"]
+
+    def test_spans_cover_lines(self):
+        """ Byte ranges cover the file after the header, on line ends """
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        header, spans = provider.split_gtfs_file(provider.TRIPS_FILE, 4096)
+        with open(os.path.join(self.DATA_DIRECTORY, provider.TRIPS_FILE), 'rb') as the_file:
+            content = the_file.read()
+
+        assert spans[0][0] == len(header)
+        assert spans[-1][1] == len(content)
+        for (_, end), (start, _) in zip(spans, spans[1:]):
+            assert end == start
+            assert content[end - 1] == "\n"
+
+    def test_zip_archive(self):
+        """ Members of an archive are loaded whole in the workers """
+        handle, filename = tempfile.mkstemp(suffix=".zip")
+        os.close(handle)
+        try:
+            with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for name in (GtfsProviderCsv.STOPS_FILE, GtfsProviderCsv.STOP_TIMES_FILE):
+                    archive.write(os.path.join(self.DATA_DIRECTORY, name), name)
+            provider = GtfsProviderZip(filename)
+            tables = provider.load_all(workers=2, chunk_bytes=500)
+        finally:
+            os.remove(filename)
+
+        assert sorted(tables) == [GtfsProviderCsv.STOP_TIMES_FILE,
+                                  GtfsProviderCsv.STOPS_FILE]
+        expected = GtfsProviderCsv(self.DATA_DIRECTORY).load_columns(
+            GtfsProviderCsv.STOP_TIMES_FILE)
+        assert len(tables[GtfsProviderCsv.STOP_TIMES_FILE]) == len(expected)
+
+    def test_provider_inherited(self):
+        """ Workers inherit the provider, with its prefetched members,
+            rather than being sent a pickled copy of it """
+        handle, filename = tempfile.mkstemp(suffix=".zip")
+        os.close(handle)
+        try:
+            with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.write(os.path.join(self.DATA_DIRECTORY, GtfsProviderCsv.STOPS_FILE),
+                              GtfsProviderCsv.STOPS_FILE)
+            provider = UnpicklableZip(filename)
+            provider.prefetch()
+        finally:
+            os.remove(filename)
+
+        tables = provider.load_all(workers=2)
+        expected = GtfsProviderCsv(self.DATA_DIRECTORY).load_columns(
+            GtfsProviderCsv.STOPS_FILE)
+        assert tables[GtfsProviderCsv.STOPS_FILE].decode(u"stop_id") == \
+            expected.decode(u"stop_id")
+
+    @raises(ValueError)
+    def test_missing_file(self):
+        """ Asking for a file the feed lacks raises ValueError """
+        GtfsProviderCsv(self.DATA_DIRECTORY).load_all(
+            workers=1, filenames=["frequencies.txt"])
+
+
+class TestReadColumns(object):
+    """ Unit tests for columnar.read_columns """
+
+    def test_missing_values(self):
+        """ Blank values and absent columns are missing, times may pass
+            midnight and a byte order mark is ignored """
+        lines = [
+            "\xef\xbb\xbftrip_id,arrival_time,departure_time,stop_id,stop_sequence\n",
+            "a,25:01:00,,s1,1\n",
+            "a,,25:02:00,s2,2\n",
+            ]
+        table = read_columns(lines, schema(models.STOP_TIMES_KEYS))
+
+        assert table[u"arrival_time"].tolist() == [90060, -1]
+        assert table[u"departure_time"].tolist() == [-1, 90120]
+        assert table[u"pickup_type"].tolist() == [-1, -1]
+        assert numpy.isnan(table[u"shape_dist_traveled"]).all()
+
+    def test_empty(self):
+        """ A file with only a header gives empty columns """
+        table = read_columns(["stop_id,stop_lat\n"], schema(models.STOPS_KEYS))
+        assert len(table) == 0
+        assert table[u"stop_lat"].dtype == numpy.float64
+
+    @raises(ValueError)
+    def test_overflow(self):
+        """ A sequence too big for int16 is rejected """
+        read_columns(["trip_id,stop_sequence\n", "a,40000\n"],
+                     schema(models.STOP_TIMES_KEYS))
+
+    def test_text_not_shared(self):
+        """ Only id columns are added to the shared dictionaries """
+        dictionaries = {}
+        read_columns(["stop_id,stop_name\n", "a,b\n"],
+                     schema(models.STOPS_KEYS), dictionaries)
+        assert set(dictionaries) == set([u"stop_id"])
+
+
+class TestStopGraph(object):
+    """ Unit tests for building graphs from stop_times columns """
+
+    lines = [
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n",
+        "t2,08:10:00,08:10:00,a,1\n",
+        "t1,08:00:00,08:00:30,a,1\n",
+        "t1,08:02:00,08:02:00,b,2\n",
+        "t1,08:05:00,08:05:00,c,3\n",
+        "t2,08:11:00,08:11:00,b,2\n",
+        ]
+
+    def test_hops(self):
+        """ Hops join consecutive stops of each trip, whatever the
+            order of the rows """
+        table = read_columns(self.lines, schema(models.STOP_TIMES_KEYS))
+        firsts, seconds, times = stop_time_hops(table)
+
+        stop_ids = table.dictionaries[u"stop_id"].values
+        hops = sorted(zip([stop_ids[i] for i in firsts],
+                          [stop_ids[i] for i in seconds], times.tolist()))
+        assert hops == [(u"a", u"b", 60), (u"a", u"b", 90), (u"b", u"c", 180)]
+
+    def test_stop_graph(self):
+        """ The quickest hop between two stops is kept """
+        table = read_columns(self.lines, schema(models.STOP_TIMES_KEYS))
+        graph = stop_graph(table)
+
+        a, b, c = [graph.vertex_ids.index(stop) for stop in (u"a", u"b", u"c")]
+        assert graph.vertex_count == 3
+        assert graph.get_weight_of_edge(a, b) == 60
+        assert graph.get_weight_of_edge(b, c) == 180
+        assert graph.get_edge_count() == 2
+
+    def test_stops_as_vertices(self):
+        """ With stop codes taken from the stops file, vertex i of the
+            graph is stop row i """
+        provider = GtfsProviderCsv(TestLoadColumns.DATA_DIRECTORY)
+        interner = IdInterner()
+        stops = provider.load_stops()
+        interner.index_stops(stops)
+        stop_times = provider.load_columns(provider.STOP_TIMES_FILE,
+                                           interner.tables)
+
+        graph = stop_graph(stop_times)
+        assert graph.vertex_count == len(stops)
+        assert graph.vertex_ids[5] == stops[5][u"stop_id"]
+        assert graph.get_edge_count() > 0
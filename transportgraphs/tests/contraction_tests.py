@@ -0,0 +1,104 @@
+import os
+import random
+import tempfile
+from nose.tools import raises
+from graphs.graphs import WeightedDiGraph
+from graphs.graphs import SearchContext
+from graphs.graphs import dijikstra
+from graphs.contraction import ContractionHierarchy
+from graphs.contraction import HEADER
+from graphs.storage import BIG_ENDIAN
+
+
+def random_graph(seed, n_vertices, n_edges, max_weight=20):
+    """ A seeded random graph for comparing against dijikstra """
+    rng = random.Random(seed)
+    edges = [
+        (rng.randrange(n_vertices), rng.randrange(n_vertices), rng.randint(0, max_weight))
+        for _ in xrange(n_edges)
+        ]
+    return WeightedDiGraph(n_vertices, edges)
+
+
+def path_cost(graph, path):
+    """ Sums the weights of the original edges along a path """
+    return sum(graph.get_weight_of_edge(path[i], path[i + 1])
+               for i in xrange(len(path) - 1))
+
+
+class TestContractionHierarchy(object):
+    """ Unit tests for contraction.ContractionHierarchy """
+
+    def check_against_dijikstra(self, graph, hierarchy):
+        """ Every query agrees with dijikstra and unpacks to a path
+            of original edges """
+        n_vertices = graph.vertex_count
+        for source in xrange(n_vertices):
+            context = dijikstra(graph, source, context=SearchContext(n_vertices))
+            for target in xrange(n_vertices):
+                if not context.is_reached(target):
+                    continue
+                path = hierarchy.query(source, target)
+                assert path.cost == context.get_cost(target)
+                assert path[0] == source and path[-1] == target
+                assert path_cost(graph, path) == path.cost
+
+    def test_shortest_paths(self):
+        """ Shortest paths found in graph """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+        hierarchy = ContractionHierarchy.build(graph)
+
+        assert str(hierarchy.query(0, 0)) == "cost: 0 path: (0,)"
+        assert str(hierarchy.query(0, 3)) == "cost: 14 path: (0, 1, 3)"
+        assert str(hierarchy.query(0, 4)) == "cost: 11 path: (0, 1, 2, 4)"
+
+    def test_matches_dijikstra(self):
+        """ Queries agree with dijikstra on random graphs """
+        for seed in xrange(3):
+            graph = random_graph(seed, 40, 120)
+            self.check_against_dijikstra(graph, ContractionHierarchy.build(graph))
+
+    def test_save_and_load(self):
+        """ A saved hierarchy answers queries the same once loaded """
+        graph = random_graph(11, 30, 90)
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            ContractionHierarchy.build(graph).save(filename)
+            loaded = ContractionHierarchy.load(filename)
+        finally:
+            os.remove(filename)
+
+        self.check_against_dijikstra(graph, loaded)
+
+    @raises(ValueError)
+    def test_other_byte_order(self):
+        """ A file written with the other byte order is rejected """
+        graph = random_graph(11, 30, 90)
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            ContractionHierarchy.build(graph).save(filename)
+            with open(filename, 'r+b') as the_file:
+                magic, version, flags = HEADER.unpack(the_file.read(HEADER.size))
+                the_file.seek(0)
+                the_file.write(HEADER.pack(magic, version, flags ^ BIG_ENDIAN))
+            ContractionHierarchy.load(filename)
+        finally:
+            os.remove(filename)
+
+    @raises(ValueError)
+    def test_unreachable(self):
+        """ An unreachable target is an error """
+        graph = WeightedDiGraph(3, [(0, 1, 1), (2, 1, 1)])
+        ContractionHierarchy.build(graph).query(0, 2)
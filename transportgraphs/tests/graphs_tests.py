@@ -1,9 +1,21 @@
+import random
 import nose
+from nose.tools import raises
 from graphs.graphs import WeightedDiGraph
 from graphs.graphs import bellman_ford
 from graphs.graphs import create_path_from_graph
 from graphs.graphs import Path
 from graphs.graphs import dijikstra
+from graphs.graphs import dijkstra_search
+from graphs.graphs import bidirectional_dijkstra
+from graphs.graphs import SearchContext
+from graphs.graphs import SearchStats
+from graphs.graphs import astar
+from graphs.graphs import spfa
+from graphs.graphs import repair_shortest_paths
+from graphs.graphs import k_shortest_paths
+from graphs.graphs import reachable_within
+from graphs.heuristics import haversine_distance
 
 class TestWeightedDigraph(object):
 
@@ -102,6 +114,117 @@ class TestWeightedDigraph(object):
                 ]
             )
 
+    def test_get_parents_without_index(self):
+        """ It gets parents correctly without the reverse index """
+        edges = [
+            (0, 1, 5),
+            (2, 1, 1),
+            (4, 5, 3)
+            ]
+
+        graph = WeightedDiGraph(6, edges, reverse_index=False)
+        vertices = graph.get_vertices_dict()
+
+        assert not graph.has_reverse_index()
+        assert set(graph.get_parents(0)) == set([])
+        assert set(graph.get_parents(5)) == set([vertices[4]])
+        assert set(graph.get_parents(1)) == set([vertices[0], vertices[2]])
+
+    def test_get_incoming_edges(self):
+        """ It gets the edges into a vertex, with or without the
+            reverse index """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (2, 4, 5),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        for reverse_index in (True, False):
+            graph = WeightedDiGraph(5, edges, reverse_index=reverse_index)
+            incoming = set(
+                (edge.get_first_vertex(), edge.get_second_vertex(), edge.weight)
+                for edge in graph.get_incoming_edges(4))
+
+            assert incoming == set([(1, 4, 7), (2, 4, 5)])
+            assert graph.get_incoming_edges(3) == []
+
+    def test_get_weight_of_edge(self):
+        """ It looks up edge weights, with infinity for missing edges """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7.5),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+
+        assert graph.get_weight_of_edge(0, 1) == 5
+        assert graph.get_weight_of_edge(1, 4) == 7.5
+        assert graph.get_weight_of_edge(1, 2) == 1
+        assert graph.get_weight_of_edge(4, 1) == float("+inf")
+        assert graph.get_weight_of_edge(3, 2) == float("+inf")
+
+    def test_duplicate_edges(self):
+        """ The last of several edges between two vertices wins """
+        edges = [
+            (0, 1, 5),
+            (0, 2, 3),
+            (0, 1, 2)
+            ]
+
+        graph = WeightedDiGraph(3, edges)
+
+        assert graph.get_edge_count() == 2
+        assert graph.get_weight_of_edge(0, 1) == 2
+        assert list(graph.get_neighbour_ids(0)) == [1, 2]
+
+    @raises(ValueError)
+    def test_edge_out_of_range(self):
+        """ Edges to vertices outside the graph are rejected """
+        WeightedDiGraph(3, [(0, 3, 1)])
+
+    def test_update_edge_weight(self):
+        """ It changes the weight of an edge in both directions """
+        graph = WeightedDiGraph(3, [(0, 1, 5), (1, 2, 1)])
+        version = graph.version
+
+        graph.update_edge_weight(0, 1, 2.5)
+
+        assert graph.get_weight_of_edge(0, 1) == 2.5
+        assert graph.get_weight_of_edge(1, 2) == 1
+        assert [edge.weight for edge in graph.get_incoming_edges(1)] == [2.5]
+        assert graph.version > version
+
+    @raises(ValueError)
+    def test_update_missing_edge(self):
+        """ Only existing edges can have their weight changed """
+        WeightedDiGraph(3, [(0, 1, 5)]).update_edge_weight(1, 0, 1)
+
+    def test_add_and_remove_edge(self):
+        """ It adds and removes edges, keeping both indexes in step """
+        graph = WeightedDiGraph(4, [(0, 1, 5), (2, 3, 1)])
+        vertices = graph.get_vertices_dict()
+
+        graph.add_edge(0, 3, 4)
+        graph.add_edge(1, 3, 2)
+        assert graph.get_edge_count() == 4
+        assert list(graph.get_neighbour_ids(0)) == [1, 3]
+        assert graph.get_weight_of_edge(1, 3) == 2
+        assert set(graph.get_parents(3)) == set([vertices[0], vertices[1], vertices[2]])
+
+        graph.add_edge(0, 3, 6)
+        assert graph.get_edge_count() == 4
+        assert graph.get_weight_of_edge(0, 3) == 6
+
+        graph.remove_edge(0, 1)
+        assert graph.get_edge_count() == 3
+        assert graph.get_weight_of_edge(0, 1) == float("+inf")
+        assert set(graph.get_parents(1)) == set([])
+        assert set((e.get_first_vertex(), e.get_second_vertex(), e.weight)
+                   for e in graph.get_edges()) == set([(0, 3, 6), (1, 3, 2), (2, 3, 1)])
+
 class TestPath(object):
     """ Unit tests for path object """
 
@@ -135,6 +258,32 @@ class TestBellmanFord(object):
         assert str(create_path_from_graph(graph, root, 3)) == "cost: 14 path: (0, 1, 3)"
         assert str(create_path_from_graph(graph, root, 4)) == "cost: 11 path: (0, 1, 2, 4)"
 
+    def test_context(self):
+        """ Results go to the search context when one is given """
+        edges = [
+            (0, 1, 5),
+            (1, 2, -2),
+            (0, 2, 4)
+            ]
+
+        graph = WeightedDiGraph(3, edges)
+        context = SearchContext(3)
+
+        assert bellman_ford(graph, 0, context)
+        assert all(map(lambda x: not x.workspace, graph.get_vertices()))
+        assert str(create_path_from_graph(graph, 0, 2, context)) == "cost: 3 path: (0, 1, 2)"
+
+    def test_negative_cycle(self):
+        """ A reachable negative cycle is reported """
+        edges = [
+            (0, 1, 1),
+            (1, 2, -2),
+            (2, 1, 1)
+            ]
+
+        graph = WeightedDiGraph(3, edges)
+        assert not bellman_ford(graph, 0, SearchContext(3))
+
 class TestDijikstra(object):
 
     def test_shortest_paths(self):
@@ -160,8 +309,531 @@ class TestDijikstra(object):
         assert str(create_path_from_graph(graph, root, 3)) == "cost: 14 path: (0, 1, 3)"
         assert str(create_path_from_graph(graph, root, 4)) == "cost: 11 path: (0, 1, 2, 4)"
 
+    def test_search_arrays(self):
+        """ dijkstra_search returns distance and predecessor arrays
+            that paths can be rebuilt from """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(6, edges)
+        context = dijkstra_search(graph, 0)
+
+        assert context.distances == [0, 5, 6, 14, 11, float("+inf")]
+        assert context.predecessors == [None, 0, 1, 1, 2, None]
+        assert str(create_path_from_graph(graph, 0, 4, context)) == "cost: 11 path: (0, 1, 2, 4)"
+        # the vertex workspaces are left alone
+        assert all(map(lambda x: not x.workspace, graph.get_vertices()))
+
+    def test_stops_at_target(self):
+        """ The search stops once the target is settled """
+        edges = [
+            (0, 1, 1),
+            (1, 2, 1),
+            (2, 3, 1),
+            (0, 4, 10),
+            (4, 5, 1)
+            ]
+
+        graph = WeightedDiGraph(6, edges)
+        context = dijkstra_search(graph, 0, target=2)
+
+        assert str(create_path_from_graph(graph, 0, 2, context)) == "cost: 2 path: (0, 1, 2)"
+        # vertices beyond the target are never reached
+        assert not context.is_reached(5)
+
+    def test_sparse_context(self):
+        """ A sparse context only holds the vertices reached """
+        edges = [
+            (0, 1, 1),
+            (1, 2, 1),
+            (3, 4, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+        context = dijikstra(graph, 0, context=SearchContext())
+
+        assert set(context.reached_vertices()) == set([0, 1, 2])
+        assert context.get_cost(4) == float("+inf")
+        assert context.get_predecessor(4) is None
+        assert str(create_path_from_graph(graph, 0, 2, context)) == "cost: 2 path: (0, 1, 2)"
+
+    def test_queries_share_graph(self):
+        """ Queries with their own contexts leave the graph untouched
+            and do not see each other's state """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+        from_zero = dijikstra(graph, 0, context=SearchContext(5))
+        from_three = dijikstra(graph, 3, context=SearchContext(5))
+
+        assert all(map(lambda x: not x.workspace, graph.get_vertices()))
+        assert str(create_path_from_graph(graph, 0, 4, from_zero)) == "cost: 11 path: (0, 1, 2, 4)"
+        assert str(create_path_from_graph(graph, 3, 4, from_three)) == "cost: 13 path: (3, 2, 4)"
+
+    @raises(ValueError)
+    def test_unreachable(self):
+        """ Asking for a path to an unreached vertex is an error """
+        graph = WeightedDiGraph(3, [(0, 1, 1)])
+        context = dijkstra_search(graph, 0)
+        create_path_from_graph(graph, 0, 2, context)
+
+class TestBidirectionalDijkstra(object):
+
+    def test_shortest_paths(self):
+        """ Shortest paths found in graph """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+
+        assert str(bidirectional_dijkstra(graph, 0, 0)) == "cost: 0 path: (0,)"
+        assert str(bidirectional_dijkstra(graph, 0, 1)) == "cost: 5 path: (0, 1)"
+        assert str(bidirectional_dijkstra(graph, 0, 2)) == "cost: 6 path: (0, 1, 2)"
+        assert str(bidirectional_dijkstra(graph, 0, 3)) == "cost: 14 path: (0, 1, 3)"
+        assert str(bidirectional_dijkstra(graph, 0, 4)) == "cost: 11 path: (0, 1, 2, 4)"
+
+    def test_matches_dijikstra(self):
+        """ Path costs agree with dijikstra on a random graph """
+        rng = random.Random(7)
+        n_vertices = 60
+        edges = [
+            (rng.randrange(n_vertices), rng.randrange(n_vertices), rng.randint(0, 20))
+            for _ in xrange(240)
+            ]
+
+        graph = WeightedDiGraph(n_vertices, edges)
+        for source in xrange(0, n_vertices, 7):
+            context = dijikstra(graph, source, context=SearchContext(n_vertices))
+            for target in xrange(n_vertices):
+                if not context.is_reached(target):
+                    continue
+                path = bidirectional_dijkstra(graph, source, target)
+                assert path.cost == context.get_cost(target)
+                assert path[0] == source and path[-1] == target
+                assert sum(graph.get_weight_of_edge(path[i], path[i + 1])
+                           for i in xrange(len(path) - 1)) == path.cost
+
+    @raises(ValueError)
+    def test_unreachable(self):
+        """ An unreachable target is an error """
+        graph = WeightedDiGraph(3, [(0, 1, 1), (2, 1, 1)])
+        bidirectional_dijkstra(graph, 0, 2)
+
+    @raises(ValueError)
+    def test_needs_reverse_index(self):
+        """ The backward search needs the reverse index """
+        graph = WeightedDiGraph(2, [(0, 1, 1)], reverse_index=False)
+        bidirectional_dijkstra(graph, 0, 1)
+
+class TestAstar(object):
+
+    def grid(self, size):
+        """ A size x size grid of stops 0.01 degrees apart, with edges
+            timed at 10 m/s between neighbouring stops """
+        coordinates = [
+            (53.0 + 0.01 * (i // size), -6.0 + 0.01 * (i % size))
+            for i in xrange(size * size)
+            ]
+        edges = []
+        for i in xrange(size * size):
+            for j in (i + 1, i + size):
+                if j < size * size and (j == i + size or j % size):
+                    weight = haversine_distance(coordinates[i], coordinates[j]) / 10
+                    edges.append((i, j, weight))
+                    edges.append((j, i, weight))
+        return WeightedDiGraph(size * size, edges), coordinates
+
+    def test_shortest_paths(self):
+        """ Without a heuristic A* finds the same paths as dijikstra """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+
+        assert str(astar(graph, 0, 0)) == "cost: 0 path: (0,)"
+        assert str(astar(graph, 0, 3)) == "cost: 14 path: (0, 1, 3)"
+        assert str(astar(graph, 0, 4)) == "cost: 11 path: (0, 1, 2, 4)"
+
+    def test_coordinates(self):
+        """ With coordinates A* finds optimal paths while reaching
+            fewer vertices than dijikstra """
+        graph, coordinates = self.grid(20)
+        source, target = 10 * 20 + 10, 10 * 20 + 19
+
+        full = dijkstra_search(graph, source, target)
+        context = SearchContext()
+        path = astar(graph, source, target, coordinates=coordinates,
+                     context=context)
+
+        assert abs(path.cost - full.get_cost(target)) < 1e-6
+        assert len(context.reached_vertices()) < len(full.reached_vertices())
+
+    @raises(ValueError)
+    def test_unreachable(self):
+        """ An unreachable target is an error """
+        graph = WeightedDiGraph(3, [(0, 1, 1)])
+        astar(graph, 0, 2)
+
+def negative_weight_graph(seed, n_vertices, n_edges):
+    """ A seeded random graph with negative edges but no negative
+        cycles, made by shifting non-negative weights with vertex
+        potentials """
+    rng = random.Random(seed)
+    potentials = [rng.randint(0, 30) for _ in xrange(n_vertices)]
+    edges = []
+    for _ in xrange(n_edges):
+        u_id, v_id = rng.randrange(n_vertices), rng.randrange(n_vertices)
+        edges.append((u_id, v_id, rng.randint(0, 20) + potentials[u_id] - potentials[v_id]))
+    return WeightedDiGraph(n_vertices, edges)
+
+class TestSpfa(object):
+
+    def test_shortest_paths(self):
+        """ Shortest paths found in graph """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+        root = 0
+
+        assert spfa(graph, root)
+
+        assert str(create_path_from_graph(graph, root, 0)) == "cost: 0 path: (0,)"
+        assert str(create_path_from_graph(graph, root, 2)) == "cost: 6 path: (0, 1, 2)"
+        assert str(create_path_from_graph(graph, root, 3)) == "cost: 14 path: (0, 1, 3)"
+        assert str(create_path_from_graph(graph, root, 4)) == "cost: 11 path: (0, 1, 2, 4)"
+
+    def test_matches_bellman_ford(self):
+        """ Path costs agree with bellman_ford on graphs with
+            negative edges """
+        for seed in xrange(3):
+            graph = negative_weight_graph(seed, 40, 160)
+            expected = SearchContext(40)
+            assert bellman_ford(graph, 0, expected)
+            context = SearchContext(40)
+            assert spfa(graph, 0, context)
+            assert context.distances == expected.distances
+
+    def test_negative_cycle(self):
+        """ A reachable negative cycle is reported, an unreachable
+            one is not """
+        edges = [
+            (0, 1, 1),
+            (1, 2, -2),
+            (2, 1, 1),
+            (3, 0, 1)
+            ]
+
+        graph = WeightedDiGraph(4, edges)
+        assert not spfa(graph, 0, SearchContext(4))
+
+        edges = [
+            (0, 1, 1),
+            (2, 3, -5),
+            (3, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(4, edges)
+        assert spfa(graph, 0, SearchContext(4))
+
+class TestRepairShortestPaths(object):
+
+    def check(self, graph, source, context):
+        """ The repaired context matches a new search """
+        expected = dijkstra_search(graph, source)
+        assert context.distances == expected.distances
+        for vertex_id in context.reached_vertices():
+            path = create_path_from_graph(graph, source, vertex_id, context)
+            assert sum(graph.get_weight_of_edge(path[i], path[i + 1])
+                       for i in xrange(len(path) - 1)) == path.cost
+
+    def test_increase_and_decrease(self):
+        """ Repairs after a tree edge gets dearer and another cheaper """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+        context = dijkstra_search(graph, 0)
+
+        graph.update_edge_weight(1, 2, 10)
+        repair_shortest_paths(graph, context, [(1, 2)])
+        self.check(graph, 0, context)
+        assert str(create_path_from_graph(graph, 0, 4, context)) == "cost: 12 path: (0, 1, 4)"
+
+        graph.update_edge_weight(1, 3, 1)
+        repair_shortest_paths(graph, context, [(1, 3)])
+        self.check(graph, 0, context)
+        assert str(create_path_from_graph(graph, 0, 3, context)) == "cost: 6 path: (0, 1, 3)"
+
+    def test_remove_disconnects(self):
+        """ Vertices cut off by a removed edge become unreached """
+        graph = WeightedDiGraph(3, [(0, 1, 1), (1, 2, 1)])
+        context = dijkstra_search(graph, 0, context=SearchContext())
+
+        graph.remove_edge(0, 1)
+        repair_shortest_paths(graph, context, [(0, 1)])
+
+        assert set(context.reached_vertices()) == set([0])
+
+    def test_random_changes(self):
+        """ Repairs agree with new searches over random changes """
+        rng = random.Random(3)
+        n_vertices = 50
+        edges = [
+            (rng.randrange(n_vertices), rng.randrange(n_vertices), rng.randint(0, 20))
+            for _ in xrange(200)
+            ]
+
+        graph = WeightedDiGraph(n_vertices, edges)
+        context = dijkstra_search(graph, 0)
+        for _ in xrange(40):
+            changes = []
+            for _ in xrange(3):
+                edge = rng.choice(graph.get_edges())
+                u_id, v_id = edge.get_first_vertex(), edge.get_second_vertex()
+                action = rng.randrange(3)
+                if action == 0:
+                    graph.update_edge_weight(u_id, v_id, rng.randint(0, 40))
+                elif action == 1:
+                    graph.remove_edge(u_id, v_id)
+                else:
+                    u_id, v_id = rng.randrange(n_vertices), rng.randrange(n_vertices)
+                    graph.add_edge(u_id, v_id, rng.randint(0, 20))
+                changes.append((u_id, v_id))
+            repair_shortest_paths(graph, context, changes)
+            self.check(graph, 0, context)
+
+    @raises(ValueError)
+    def test_needs_complete_search(self):
+        """ A search stopped at a target cannot be repaired """
+        graph = WeightedDiGraph(3, [(0, 1, 1), (1, 2, 1)])
+        context = dijkstra_search(graph, 0, target=1)
+        repair_shortest_paths(graph, context, [(0, 1)])
+
+class TestKShortestPaths(object):
+
+    def all_simple_paths(self, graph, source, target):
+        """ Every loopless path from source to target with its cost """
+        found = []
+        stack = [(source, (source,), 0)]
+        while stack:
+            u_id, path, cost = stack.pop()
+            if u_id == target:
+                found.append((cost, path))
+                continue
+            for v_id in graph.get_neighbour_ids(u_id):
+                if v_id not in path:
+                    stack.append((v_id, path + (v_id,),
+                                  cost + graph.get_weight_of_edge(u_id, v_id)))
+        return sorted(found)
+
+    def test_ranked_paths(self):
+        """ Paths come back cheapest first """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+        paths = k_shortest_paths(graph, 0, 4, 3)
+
+        assert [str(path) for path in paths] == [
+            "cost: 11 path: (0, 1, 2, 4)",
+            "cost: 12 path: (0, 1, 4)",
+            "cost: 27 path: (0, 1, 3, 2, 4)"
+            ]
+
+    def test_fewer_paths_than_asked(self):
+        """ Only the loopless paths that exist are returned """
+        graph = WeightedDiGraph(3, [(0, 1, 1), (1, 2, 1), (2, 1, 1)])
+
+        assert [str(path) for path in k_shortest_paths(graph, 0, 2, 5)] == [
+            "cost: 2 path: (0, 1, 2)"]
+        assert k_shortest_paths(graph, 2, 0, 5) == []
+
+    def test_matches_enumeration(self):
+        """ Costs agree with enumerating every loopless path """
+        rng = random.Random(9)
+        n_vertices = 12
+        edges = [
+            (rng.randrange(n_vertices), rng.randrange(n_vertices), rng.randint(1, 20))
+            for _ in xrange(40)
+            ]
+
+        graph = WeightedDiGraph(n_vertices, edges)
+        for target in xrange(1, n_vertices):
+            expected = self.all_simple_paths(graph, 0, target)
+            paths = k_shortest_paths(graph, 0, target, 6)
+            assert [path.cost for path in paths] == [cost for cost, _ in expected[:6]]
+            assert len(set(path.path for path in paths)) == len(paths)
+            for path in paths:
+                assert len(set(path.path)) == len(path)
+                assert sum(graph.get_weight_of_edge(path[i], path[i + 1])
+                           for i in xrange(len(path) - 1)) == path.cost
+
+class TestReachableWithin(object):
+
+    def test_budget(self):
+        """ Only vertices within the budget are returned """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+
+        assert reachable_within(graph, 0, 0) == {0: 0}
+        assert reachable_within(graph, 0, 6) == {0: 0, 1: 5, 2: 6}
+        assert reachable_within(graph, 0, 11) == {0: 0, 1: 5, 2: 6, 4: 11}
+        assert reachable_within(graph, 0, 100) == {0: 0, 1: 5, 2: 6, 3: 14, 4: 11}
+
+    def test_only_touches_budget(self):
+        """ Vertices beyond the budget are never stored in the context,
+            and paths within it can be rebuilt """
+        edges = [(i, i + 1, 1) for i in xrange(99)]
+        graph = WeightedDiGraph(100, edges)
+        context = SearchContext()
+
+        within = reachable_within(graph, 10, 5, context)
+
+        assert within == dict((i, i - 10) for i in xrange(10, 16))
+        assert set(context.reached_vertices()) == set(within)
+        assert str(create_path_from_graph(graph, 10, 13, context)) == "cost: 3 path: (10, 11, 12, 13)"
+
+    def test_matches_dijikstra(self):
+        """ Costs agree with dijikstra on a random graph """
+        rng = random.Random(5)
+        n_vertices = 80
+        edges = [
+            (rng.randrange(n_vertices), rng.randrange(n_vertices), rng.randint(0, 20))
+            for _ in xrange(300)
+            ]
+
+        graph = WeightedDiGraph(n_vertices, edges)
+        full = dijkstra_search(graph, 0)
+        for budget in (0, 10, 25, 50):
+            expected = dict((v, full.get_cost(v)) for v in full.reached_vertices()
+                            if full.get_cost(v) <= budget)
+            assert reachable_within(graph, 0, budget) == expected
+
+
+class TestSearchStats(object):
+
+    edges = [
+        (0, 1, 5),
+        (1, 4, 7),
+        (3, 2, 8),
+        (2, 4, 5),
+        (1, 3, 9),
+        (2, 1, 1),
+        (1, 2, 1)
+        ]
+
+    def test_dijikstra_counts(self):
+        """ Heap operations, relaxations and settled vertices are counted,
+            including the stale entry left for vertex 4 """
+        graph = WeightedDiGraph(5, self.edges)
+        stats = SearchStats()
+
+        dijikstra(graph, 0, stats=stats)
+
+        assert stats.heap_pushes == 6
+        assert stats.heap_pops == 6
+        assert stats.settled == 5
+        assert stats.edges_scanned == 7
+        assert stats.relaxations == 7
+        assert stats.successful_relaxations == 5
+        assert set(stats.timings) == set(["init", "search", "workspace"])
+        assert str(create_path_from_graph(graph, 0, 4)) == "cost: 11 path: (0, 1, 2, 4)"
+
+    def test_target_stops_counting(self):
+        """ An early exit counts only the work done up to the target """
+        graph = WeightedDiGraph(5, self.edges)
+        stats = SearchStats()
+
+        dijkstra_search(graph, 0, 1, stats=stats)
+
+        assert stats.settled == 2
+        assert stats.heap_pops == 2
+        assert stats.edges_scanned == 1
+
+    def test_bellman_ford_counts(self):
+        """ Every edge of every pass goes through relax and is counted """
+        graph = WeightedDiGraph(5, self.edges)
+        stats = SearchStats()
 
+        assert bellman_ford(graph, 0, SearchContext(5), stats)
 
+        assert stats.relaxations % len(self.edges) == 0
+        assert stats.edges_scanned == stats.relaxations
+        assert stats.successful_relaxations >= 4
+        assert stats.heap_pushes == 0
+        assert set(stats.timings) == set(["init", "relax"])
 
+    def test_accumulates_and_resets(self):
+        """ Counts add up over queries until reset """
+        graph = WeightedDiGraph(5, self.edges)
+        stats = SearchStats()
 
+        dijkstra_search(graph, 0, stats=stats)
+        dijkstra_search(graph, 0, stats=stats)
+        assert stats.as_dict()["settled"] == 10
 
+        stats.reset()
+        assert stats.as_dict() == {
+            "heap_pushes": 0, "heap_pops": 0, "relaxations": 0,
+            "successful_relaxations": 0, "settled": 0, "edges_scanned": 0,
+            "timings": {}}
@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+import zipfile
+import numpy
+from nose.tools import raises
+from gtfs.cache import GtfsProviderCached
+from gtfs.gtfsprovider import GtfsProviderCsv
+from gtfs.gtfsprovider import GtfsProviderZip
+from gtfs.interning import IdInterner
+from gtfs.sqliteprovider import GtfsProviderSqlite
+
+
+class CountingProvider(GtfsProviderCsv):
+    """ Counts the files actually parsed """
+
+    def __init__(self, directory):
+        super(CountingProvider, self).__init__(directory)
+        self.parsed = []
+
+    def load_gtfs_file(self, directory, filename):
+        self.parsed.append(filename)
+        return super(CountingProvider, self).load_gtfs_file(directory, filename)
+
+    def load_columns(self, filename, dictionaries=None):
+        self.parsed.append(filename)
+        return super(CountingProvider, self).load_columns(filename, dictionaries)
+
+
+class TestGtfsProviderCached(object):
+    """ Tests the persistent cache of parsed GTFS tables """
+
+    DATA_DIRECTORY = os.path.join(os.path.abspath(os.curdir), "tests/test_data")
+
+    def setup(self):
+        self.feed = tempfile.mkdtemp()
+        self.cache = os.path.join(tempfile.mkdtemp(), "cache")
+        for filename in ("stops.txt", "stop_times.txt", "agency.txt"):
+            shutil.copy(os.path.join(self.DATA_DIRECTORY, filename), self.feed)
+
+    def teardown(self):
+        shutil.rmtree(self.feed)
+        shutil.rmtree(os.path.dirname(self.cache))
+
+    def test_rows_cached(self):
+        """ A second provider loads rows from the cache, unparsed """
+        expected = GtfsProviderCsv(self.feed).load_stop_times()
+        first = CountingProvider(self.feed)
+        assert GtfsProviderCached(first, self.cache).load_stop_times() == expected
+        assert first.parsed == ["stop_times.txt"]
+
+        second = CountingProvider(self.feed)
+        cached = GtfsProviderCached(second, self.cache)
+        assert cached.load_stop_times() == expected
+        assert list(cached.iter_stop_times()) == expected
+        assert second.parsed == []
+
+    def test_changed_file(self):
+        """ A changed source file is parsed again """
+        provider = CountingProvider(self.feed)
+        GtfsProviderCached(provider, self.cache).load_agency()
+
+        path = os.path.join(self.feed, "agency.txt")
+        with open(path, 'ab') as the_file:
+            the_file.write('"Go-Ahead","http://example.com","Europe/Dublin"\n')
+        rows = GtfsProviderCached(provider, self.cache).load_agency()
+
+        assert provider.parsed == ["agency.txt", "agency.txt"]
+        assert rows[-1][u"agency_name"] == u"Go-Ahead"
+
+    def test_touched_file(self):
+        """ A file whose modification time alone changes is hashed and
+            served from the cache """
+        provider = CountingProvider(self.feed)
+        GtfsProviderCached(provider, self.cache).load_stops()
+
+        path = os.path.join(self.feed, "stops.txt")
+        os.utime(path, (1, 1))
+        GtfsProviderCached(provider, self.cache).load_stops()
+        GtfsProviderCached(provider, self.cache).load_stops()
+
+        assert provider.parsed == ["stops.txt"]
+
+    def test_columns_cached(self):
+        """ ColumnTables come back from the cache, re-encoded into
+            shared dictionaries """
+        expected = GtfsProviderCsv(self.feed).load_columns("stop_times.txt")
+        provider = CountingProvider(self.feed)
+        GtfsProviderCached(provider, self.cache).load_columns("stop_times.txt")
+
+        interner = IdInterner()
+        interner.index_stops(GtfsProviderCsv(self.feed).load_stops())
+        table = GtfsProviderCached(provider, self.cache).load_columns(
+            "stop_times.txt", interner.tables)
+
+        assert provider.parsed == ["stop_times.txt"]
+        assert table.decode(u"stop_id") == expected.decode(u"stop_id")
+        assert table.dictionaries[u"stop_id"] is interner[u"stop_id"]
+        assert numpy.array_equal(table[u"arrival_time"], expected[u"arrival_time"])
+
+    def test_missing_file(self):
+        """ A missing file loads as from the provider and is not cached """
+        cached = GtfsProviderCached(GtfsProviderCsv(self.feed), self.cache)
+        assert cached.load_trips() is None
+        assert not os.path.exists(os.path.join(self.cache, "trips.txt.rows"))
+
+    @raises(ValueError)
+    def test_missing_columns(self):
+        """ Columns of a missing file raise ValueError """
+        GtfsProviderCached(GtfsProviderCsv(self.feed), self.cache).load_columns("trips.txt")
+
+    def test_clear(self):
+        """ clear deletes the cache """
+        cached = GtfsProviderCached(GtfsProviderCsv(self.feed), self.cache)
+        cached.load_stops()
+        cached.clear()
+        assert not os.path.exists(self.cache)
+        assert cached.load_stops()
+
+    def test_rebuilt_zip(self):
+        """ A zip member whose content changes but whose size and fixed
+            timestamp do not is parsed again """
+        archive_path = os.path.join(self.feed, "feed.zip")
+
+        def build(date):
+            with zipfile.ZipFile(archive_path, 'w') as archive:
+                info = zipfile.ZipInfo("calendar_dates.txt", (1980, 1, 1, 0, 0, 0))
+                archive.writestr(info, "service_id,date,exception_type\n"
+                                       "1,{0},2\n".format(date))
+
+        build("20240101")
+        first = GtfsProviderCached(GtfsProviderZip(archive_path), self.cache)
+        assert first.load_calendar_dates()[0][u"date"] == u"20240101"
+
+        build("20240202")
+        second = GtfsProviderCached(GtfsProviderZip(archive_path), self.cache)
+        assert second.load_calendar_dates()[0][u"date"] == u"20240202"
+
+    def test_iter_missing_file(self):
+        """ iter_X of a missing file yields no rows, so the cache can
+            feed an import of a feed without its optional files """
+        cached = GtfsProviderCached(GtfsProviderCsv(self.feed), self.cache)
+        assert list(cached.iter_shapes()) == []
+
+        database = os.path.join(os.path.dirname(self.cache), "feed.sqlite")
+        provider = GtfsProviderSqlite.import_feed(cached, database)
+        try:
+            assert provider.load_shapes() == []
+            assert provider.load_stops() == GtfsProviderCsv(self.feed).load_stops()
+        finally:
+            provider.close()
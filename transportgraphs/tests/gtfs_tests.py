@@ -1,8 +1,12 @@
 import os
+import tempfile
+import zipfile
 from nose.tools import raises
 import gtfs.models as models
 from gtfs.gtfsprovider import GtfsProviderCsv
 from gtfs.gtfsprovider import GtfsProviderSingleRowMock
+from gtfs.gtfsprovider import GtfsProviderZip
+from gtfs.gtfsprovider import iter_csv
 from utils.decorators import CheckPathIsValid
 
 
@@ -107,6 +111,101 @@ class TestCsvGtfsProvider(object):
         assert set(first.keys()) == set(models.TRIPS_KEYS)
 
 
+class TestCsvGtfsProviderIterators(object):
+    """ Tests the streaming of GTFS csvs """
+
+    DATA_DIRECTORY = os.path.join(os.path.abspath(os.curdir), "tests/test_data")
+
+    def test_iter_matches_load(self):
+        """ Every iter_X yields the rows that load_X returns """
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        for name in ("agency", "calendar_dates", "calendar", "shapes",
+                     "stops", "routes", "stop_times", "trips"):
+            rows = getattr(provider, "iter_" + name)()
+            assert not isinstance(rows, list)
+            assert list(rows) == getattr(provider, "load_" + name)()
+
+    def test_iter_is_lazy(self):
+        """ Rows are read as they are asked for """
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        rows = provider.iter_stop_times()
+        first = next(rows)
+        assert set(first.keys()) == set(models.STOP_TIMES_KEYS)
+
+    def test_missing_file(self):
+        """ A missing file yields no rows """
+        provider = GtfsProviderCsv("not/a/directory")
+        assert list(provider.iter_stops()) == []
+
+    @raises(ValueError)
+    def test_iter_csv_bad_path(self):
+        """ iter_csv checks the path when called, not when iterated """
+        iter_csv("not/a/file.txt")
+
+    def test_default_iterators(self):
+        """ Providers without streaming iterate over load_X """
+        provider = GtfsProviderSingleRowMock()
+        assert list(provider.iter_trips()) == provider.load_trips()
+
+
+class TestZipGtfsProvider(object):
+    """ Tests the loading of GTFS csvs from a zip archive """
+
+    DATA_DIRECTORY = os.path.join(os.path.abspath(os.curdir), "tests/test_data")
+
+    def setup(self):
+        handle, self.filename = tempfile.mkstemp(suffix=".zip")
+        os.close(handle)
+        with zipfile.ZipFile(self.filename, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for filename in GtfsProviderCsv.GTFS_FILES:
+                if filename != GtfsProviderCsv.SHAPES_FILE:
+                    archive.write(os.path.join(self.DATA_DIRECTORY, filename),
+                                  "feed/" + filename)
+
+    def teardown(self):
+        os.remove(self.filename)
+
+    def test_matches_directory(self):
+        """ Every file loads and streams as from the directory """
+        expected = GtfsProviderCsv(self.DATA_DIRECTORY)
+        provider = GtfsProviderZip(self.filename)
+        for name in ("agency", "calendar_dates", "calendar", "stops",
+                     "routes", "stop_times", "trips"):
+            rows = getattr(expected, "load_" + name)()
+            assert getattr(provider, "load_" + name)() == rows
+            assert list(getattr(provider, "iter_" + name)()) == rows
+
+    def test_missing_member(self):
+        """ A file missing from the archive loads as for a directory """
+        provider = GtfsProviderZip(self.filename)
+        assert provider.load_shapes() is None
+        assert list(provider.iter_shapes()) == []
+
+    @raises(ValueError)
+    def test_not_an_archive(self):
+        """ A path that is not a zip archive raises ValueError """
+        GtfsProviderZip(os.path.join(self.DATA_DIRECTORY, "stops.txt")).members()
+
+    def test_prefetch(self):
+        """ Members decompressed in parallel load the same rows """
+        expected = GtfsProviderCsv(self.DATA_DIRECTORY)
+        provider = GtfsProviderZip(self.filename)
+        provider.prefetch(workers=3)
+
+        assert GtfsProviderCsv.SHAPES_FILE not in provider.prefetched
+        assert len(provider.prefetched) == 7
+        assert provider.load_stop_times() == expected.load_stop_times()
+        assert provider.load_trips() == expected.load_trips()
+
+    def test_byte_order_mark(self):
+        """ A byte order mark before the header is skipped """
+        with zipfile.ZipFile(self.filename, 'w') as archive:
+            archive.writestr(GtfsProviderCsv.AGENCY_FILE,
+                             "\xef\xbb\xbfagency_name\nDublin Bus\n")
+        rows = GtfsProviderZip(self.filename).load_agency()
+        assert rows == [{u"agency_name": u"Dublin Bus"}]
+
+
 def write_to_file(filename, data):
     """ Useful for writing datastructures to file as text """
     with open(filename, 'w') as the_file:
@@ -211,3 +310,81 @@ class TestGtfsStopTime(object):
         assert stop_time.get_shape_dist_traveled() == first_element[u"shape_dist_traveled"]
 
 
+
+class TestGtfsObjectStorage(object):
+    """ Tests the compact storage, hashing and bulk validation shared
+        by the models """
+
+    DATA_DIRECTORY = os.path.join(os.path.abspath(os.curdir), "tests/test_data")
+
+    def test_slots(self):
+        """ Objects hold a values tuple and no per-object dict """
+        stop = models.Stop(GtfsProviderSingleRowMock().load_stops()[0])
+        assert not hasattr(stop, "__dict__")
+        assert stop.data == GtfsProviderSingleRowMock().load_stops()[0]
+
+    def test_optional_columns(self):
+        """ Keys beyond the required ones are kept for get and data """
+        row = dict(GtfsProviderSingleRowMock().load_stops()[0])
+        row[u"stop_code"] = u"99"
+        stop = models.Stop(row)
+
+        assert stop.get(u"stop_code") == u"99"
+        assert stop.data == row
+        assert not stop.is_valid()
+        assert models.Stop(GtfsProviderSingleRowMock().load_stops()[0]).extras is None
+
+    def test_hashing(self):
+        """ Equal objects hash equally and can be used in sets """
+        row = GtfsProviderSingleRowMock().load_routes()[0]
+        other = dict(row)
+        other[u"route_id"] = u"other"
+
+        routes = set([models.Route(row), models.Route(row), models.Route(other)])
+        assert len(routes) == 2
+        assert models.Route(row) in routes
+        assert models.Route(row) != models.Route(other)
+        assert not models.Route(row) != models.Route(row)
+
+    def test_invalid(self):
+        """ Missing or extra keys make an object invalid """
+        row = GtfsProviderSingleRowMock().load_routes()[0]
+        missing = dict(row)
+        del missing[u"route_type"]
+        extra = dict(row)
+        extra[u"agency_id"] = u"1"
+
+        assert not models.Route(missing).is_valid()
+        assert models.Route(missing).get_route_type() is None
+        assert not models.Route(extra).is_valid()
+
+    def test_validate_many(self):
+        """ validate_many builds the same objects as the constructor """
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        rows = provider.load_stop_times()
+        stop_times = models.StopTime.validate_many(provider.iter_stop_times())
+
+        assert stop_times == [models.StopTime(row) for row in rows]
+        assert all(stop_time.is_valid() for stop_time in stop_times)
+        assert stop_times[3].get_stop_id() == rows[3][u"stop_id"]
+        assert models.StopTime.validate_many([]) == []
+
+    def test_validate_many_short_row(self):
+        """ A row missing trailing fields makes an invalid object """
+        rows = GtfsProviderCsv(self.DATA_DIRECTORY).load_stops()[:3]
+        del rows[1][u"stop_lon"]
+        stops = models.Stop.validate_many(rows)
+
+        assert [stop.is_valid() for stop in stops] == [True, False, True]
+        assert stops[1].is_valid() == models.Stop(rows[1]).is_valid()
+        assert stops[1].get(u"stop_lon") is None
+
+    @raises(ValueError)
+    def test_validate_many_header(self):
+        """ validate_many rejects rows with the wrong keys """
+        models.Stop.validate_many(GtfsProviderSingleRowMock().load_routes())
+
+    @raises(NotImplementedError)
+    def test_stub_models(self):
+        """ The models without an implementation still refuse to build """
+        models.CalenderElement(GtfsProviderSingleRowMock().load_calendar()[0])
@@ -0,0 +1,58 @@
+import os
+from graphs.heuristics import haversine_distance
+from graphs.heuristics import HaversineHeuristic
+from graphs.heuristics import stop_coordinates
+from gtfs.gtfsprovider import GtfsProviderCsv
+from gtfs.gtfsprovider import GtfsProviderSingleRowMock
+import gtfs.models as models
+
+
+class TestHaversineDistance(object):
+    """ Unit tests for heuristics.haversine_distance """
+
+    def test_same_point(self):
+        """ A point is no distance from itself """
+        point = (53.3522439241978, -6.26369319257185)
+        assert haversine_distance(point, point) == 0
+
+    def test_one_degree_of_latitude(self):
+        """ One degree of latitude is about 111.2km """
+        distance = haversine_distance((53.0, -6.0), (54.0, -6.0))
+        assert abs(distance - 111195) < 1
+
+
+class TestHaversineHeuristic(object):
+    """ Unit tests for heuristics.HaversineHeuristic """
+
+    def test_time_at_max_speed(self):
+        """ The estimate is the distance over the top speed """
+        coordinates = {0: (53.0, -6.0), 1: (54.0, -6.0)}
+        heuristic = HaversineHeuristic(coordinates, max_speed=10)
+        expected = haversine_distance(coordinates[0], coordinates[1]) / 10
+        assert heuristic(0, 1) == expected
+        assert heuristic(1, 1) == 0
+
+    def test_missing_coordinates(self):
+        """ Vertices without coordinates are estimated at 0 """
+        heuristic = HaversineHeuristic([(53.0, -6.0)])
+        assert heuristic(0, 3) == 0
+        assert heuristic(3, 0) == 0
+
+
+class TestStopCoordinates(object):
+    """ Unit tests for heuristics.stop_coordinates """
+
+    DATA_DIRECTORY = os.path.join(os.path.abspath(os.curdir), "tests/test_data")
+
+    def test_from_rows(self):
+        """ Coordinates are read from stop rows in order """
+        stops = GtfsProviderSingleRowMock().load_stops()
+        coordinates = stop_coordinates(stops)
+        assert coordinates == [(53.3522439241978, -6.26369319257185)]
+
+    def test_from_stop_objects(self):
+        """ Stop objects can be given instead of rows """
+        stops = GtfsProviderCsv(self.DATA_DIRECTORY).load_stops()
+        coordinates = stop_coordinates([models.Stop(row) for row in stops])
+        assert len(coordinates) == len(stops)
+        assert coordinates[1] == (53.3523081145137, -6.26378071577474)
@@ -0,0 +1,71 @@
+import os
+import gtfs.models as models
+from gtfs.gtfsprovider import GtfsProviderCsv
+from gtfs.gtfsprovider import GtfsProviderSingleRowMock
+from gtfs.interning import IdInterner
+from gtfs.interning import IdTable
+
+
+class TestIdTable(object):
+    """ Unit tests for interning.IdTable """
+
+    def test_codes(self):
+        """ Codes are dense and follow the order of first appearance """
+        table = IdTable()
+        codes = [table.intern(v) for v in (u"b", u"a", u"b", u"\xe9")]
+
+        assert codes == [0, 1, 0, 2]
+        assert table.values == [u"b", u"a", u"\xe9"]
+        assert table.value(2) == u"\xe9"
+        assert table.code("\xc3\xa9") == 2
+        assert len(table) == 3
+
+    def test_lookup(self):
+        """ lookup does not add unknown values """
+        table = IdTable([u"x"])
+        assert table.lookup(u"x") == 0
+        assert table.lookup(u"y") == -1
+        assert u"y" not in table
+        assert len(table) == 1
+
+
+class TestIdInterner(object):
+    """ Unit tests for interning.IdInterner """
+
+    DATA_DIRECTORY = os.path.join(os.path.abspath(os.curdir), "tests/test_data")
+
+    def test_intern_row(self):
+        """ Id values become codes and other values are kept """
+        interner = IdInterner()
+        row = GtfsProviderSingleRowMock().load_trips()[0]
+        interned = interner.intern_row(row)
+
+        assert interned[u"trip_id"] == 0
+        assert interned[u"shape_id"] == 0
+        assert interned[u"trip_headsign"] == row[u"trip_headsign"]
+        assert interner.value(u"route_id", interned[u"route_id"]) == row[u"route_id"]
+        assert row[u"trip_id"] == u"4777.2.0-1-y12-1.1.O"
+
+    def test_models_on_codes(self):
+        """ Model objects built from interned rows compare by codes """
+        interner = IdInterner()
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        stop_times = [models.StopTime(row) for row in
+                      interner.intern_rows(provider.iter_stop_times())]
+
+        first = stop_times[0]
+        assert isinstance(first.get_trip_id(), int)
+        assert first == models.StopTime(interner.intern_row(
+            provider.load_stop_times()[0]))
+        assert first.get_stop_id() == interner.lookup(u"stop_id", u"8240DB003813")
+
+    def test_index_stops(self):
+        """ Stop codes follow the order of the stops file """
+        interner = IdInterner()
+        provider = GtfsProviderCsv(self.DATA_DIRECTORY)
+        stops = provider.load_stops()
+        vertex_ids = interner.index_stops(stops)
+
+        assert len(vertex_ids) == len(stops)
+        for i in (0, 10, len(stops) - 1):
+            assert interner.lookup(u"stop_id", stops[i][u"stop_id"]) == i
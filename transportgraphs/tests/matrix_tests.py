@@ -0,0 +1,53 @@
+import numpy
+from graphs.graphs import WeightedDiGraph
+from graphs.graphs import SearchContext
+from graphs.graphs import dijikstra
+from graphs.matrix import distance_matrix
+from contraction_tests import random_graph
+
+
+class TestDistanceMatrix(object):
+    """ Unit tests for matrix.distance_matrix """
+
+    def expected(self, graph, sources, targets):
+        """ The matrix built from one dijikstra call per source """
+        rows = []
+        for source in sources:
+            context = dijikstra(graph, source, context=SearchContext(graph.vertex_count))
+            rows.append([context.get_cost(target) for target in targets])
+        return numpy.array(rows)
+
+    def test_small_graph(self):
+        """ Costs are correct, with infinity for unreachable targets """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+        matrix = distance_matrix(graph, [0, 3], [4, 0], workers=1)
+
+        assert matrix.dtype == numpy.float64
+        assert matrix.tolist() == [[11.0, 0.0], [13.0, float("+inf")]]
+
+    def test_single_target(self):
+        """ A single target column is filled in """
+        graph = random_graph(5, 30, 90)
+        sources = range(30)
+        matrix = distance_matrix(graph, sources, [7], workers=1)
+        assert numpy.array_equal(matrix, self.expected(graph, sources, [7]))
+
+    def test_workers_match(self):
+        """ A process pool gives the same matrix as a single process """
+        graph = random_graph(3, 50, 200)
+        sources = range(0, 50, 3)
+        targets = range(1, 50, 2)
+
+        expected = self.expected(graph, sources, targets)
+        assert numpy.array_equal(distance_matrix(graph, sources, targets, workers=1), expected)
+        assert numpy.array_equal(distance_matrix(graph, sources, targets, workers=3), expected)
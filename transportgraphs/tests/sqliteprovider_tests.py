@@ -0,0 +1,122 @@
+import csv
+import os
+import shutil
+import tempfile
+from gtfs.gtfsprovider import GtfsProviderCsv
+from gtfs.sqliteprovider import GtfsProviderSqlite
+from gtfs.sqliteprovider import time_to_seconds
+
+
+class TestGtfsProviderSqlite(object):
+    """ Tests the SQLite backed GtfsProvider """
+
+    DATA_DIRECTORY = os.path.join(os.path.abspath(os.curdir), "tests/test_data")
+
+    def setup(self):
+        handle, self.filename = tempfile.mkstemp(suffix=".sqlite")
+        os.close(handle)
+        self.csv = GtfsProviderCsv(self.DATA_DIRECTORY)
+        self.provider = GtfsProviderSqlite.import_feed(
+            self.csv, self.filename, batch_size=7)
+
+    def teardown(self):
+        self.provider.close()
+        os.remove(self.filename)
+
+    def test_load_matches_csv(self):
+        """ Every load_X and iter_X returns the rows of the csv """
+        for name in ("agency", "calendar_dates", "calendar", "shapes",
+                     "stops", "routes", "stop_times", "trips"):
+            rows = getattr(self.csv, "load_" + name)()
+            assert getattr(self.provider, "load_" + name)() == rows
+            assert list(getattr(self.provider, "iter_" + name)()) == rows
+
+    def test_reopen(self):
+        """ An imported database can be opened again without importing """
+        provider = GtfsProviderSqlite(self.filename)
+        try:
+            assert provider.load_stops() == self.csv.load_stops()
+        finally:
+            provider.close()
+
+    def test_departures_at_stop(self):
+        """ Departures in a window come in time order """
+        trip_id = u"1.1714.0-33A-y12-1.155.I"
+        departures = self.provider.departures_at_stop(
+            u"8240DB003814", u"16:00:00", 17 * 3600)
+
+        assert [row[u"departure_time"] for row in departures] == [u"16:15:39"]
+        assert departures[0][u"trip_id"] == trip_id
+        assert self.provider.departures_at_stop(
+            u"8240DB003814", u"16:15:40", u"17:00:00") == []
+
+    def test_stop_sequence_of_trip(self):
+        """ A trip's stops come in numeric stop sequence """
+        trip_id = u"1.1714.0-33A-y12-1.155.I"
+        expected = sorted(
+            (row for row in self.csv.load_stop_times() if row[u"trip_id"] == trip_id),
+            key=lambda row: int(row[u"stop_sequence"]))
+
+        assert self.provider.stop_sequence_of_trip(trip_id) == expected
+        assert self.provider.stop_sequence_of_trip(u"no trip") == []
+
+    def test_other_lookups(self):
+        """ Trips of a route, calendar dates and stops are looked up """
+        trips = self.provider.trips_of_route(u"0-1-y12-1")
+        assert trips
+        assert all(row[u"route_id"] == u"0-1-y12-1" for row in trips)
+        assert len(self.provider.calendar_dates_on(u"20121225")) == len(
+            [row for row in self.csv.load_calendar_dates()
+             if row[u"date"] == u"20121225"])
+        assert self.provider.get_stop(u"8220DB000002")[u"stop_name"] == u"Parnell Square, Rotunda"
+        assert self.provider.get_stop(u"no stop") is None
+
+    def test_indexes_used(self):
+        """ The lookups use the indexes rather than scanning """
+        for query, index in (
+                ("SELECT * FROM stop_times WHERE stop_id = 'x' AND "
+                 "departure_seconds >= 0 AND departure_seconds < 10", "stop_times_stop"),
+                ("SELECT * FROM stop_times WHERE trip_id = 'x' ORDER BY sequence",
+                 "stop_times_trip"),
+                ("SELECT * FROM trips WHERE route_id = 'x'", "trips_route"),
+                ("SELECT * FROM calendar_dates WHERE date = 'x'", "calendar_dates_date")):
+            plan = self.provider.connection.execute(
+                "EXPLAIN QUERY PLAN " + query).fetchall()
+            assert index in " ".join(unicode(step) for step in plan)
+
+    def test_time_to_seconds(self):
+        """ Times may pass midnight; empty times are None """
+        assert time_to_seconds(u"25:00:01") == 90001
+        assert time_to_seconds(u"") is None
+        assert time_to_seconds(60) == 60
+
+    def test_optional_columns(self):
+        """ Columns beyond the model keys, including one that only
+            appears after the first rows, are kept """
+        directory = tempfile.mkdtemp()
+        try:
+            for filename in os.listdir(self.DATA_DIRECTORY):
+                shutil.copy(os.path.join(self.DATA_DIRECTORY, filename), directory)
+            stops = self.csv.load_stops()
+            with open(os.path.join(directory, "stops.txt"), 'wb') as the_file:
+                writer = csv.writer(the_file)
+                writer.writerow(["stop_id", "stop_name", "stop_lat",
+                                 "stop_lon", "stop_code", "location_type"])
+                for i, stop in enumerate(stops):
+                    row = [stop[u"stop_id"], stop[u"stop_name"], stop[u"stop_lat"],
+                           stop[u"stop_lon"], unicode(i)] + ([u"0"] if i else [])
+                    writer.writerow([value.encode("utf-8") for value in row])
+
+            extended = GtfsProviderCsv(directory)
+            provider = GtfsProviderSqlite.import_feed(
+                extended, os.path.join(directory, "feed.sqlite"))
+            try:
+                rows = provider.load_stops()
+                assert rows == extended.load_stops()
+                assert rows[0][u"stop_code"] == u"0"
+                assert u"location_type" not in rows[0]
+                assert rows[1][u"location_type"] == u"0"
+            finally:
+                provider.close()
+        finally:
+            shutil.rmtree(directory)
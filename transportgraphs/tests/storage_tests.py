@@ -0,0 +1,116 @@
+import os
+import tempfile
+from nose.tools import raises
+from graphs.graphs import WeightedDiGraph
+from graphs.graphs import create_path_from_graph
+from graphs.graphs import dijkstra_search
+from graphs import storage
+
+
+def edge_tuples(graph):
+    """ The edges of a graph as a set of tuples """
+    return set(
+        (edge.get_first_vertex(), edge.get_second_vertex(), edge.weight)
+        for edge in graph.get_edges())
+
+
+class TestStorage(object):
+    """ Unit tests for storage.save and storage.load """
+
+    EDGES = [
+        (0, 1, 5),
+        (1, 4, 7),
+        (3, 2, 8),
+        (2, 4, 5),
+        (1, 3, 9),
+        (2, 1, 1),
+        (1, 2, 1)
+        ]
+
+    def setup(self):
+        handle, self.filename = tempfile.mkstemp()
+        os.close(handle)
+
+    def teardown(self):
+        os.remove(self.filename)
+
+    def round_trip(self, graph, mmap):
+        storage.save(graph, self.filename)
+        return storage.load(self.filename, mmap=mmap)
+
+    def test_round_trip(self):
+        """ Edges, neighbours and parents survive a round trip, mapped
+            or copied """
+        graph = WeightedDiGraph(6, self.EDGES)
+        for mmap in (True, False):
+            loaded = self.round_trip(graph, mmap)
+
+            assert loaded.vertex_count == 6
+            assert loaded.get_edge_count() == len(self.EDGES)
+            assert edge_tuples(loaded) == set(self.EDGES)
+            assert list(loaded.get_neighbour_ids(1)) == [2, 3, 4]
+            assert list(loaded.get_parent_ids(4)) == [1, 2]
+            assert loaded.get_weight_of_edge(1, 3) == 9
+            assert loaded.get_weight_of_edge(3, 1) == float("+inf")
+            assert loaded.vertex_ids is None
+
+            context = dijkstra_search(loaded, 0)
+            assert str(create_path_from_graph(loaded, 0, 4, context)) == "cost: 11 path: (0, 1, 2, 4)"
+
+    def test_without_reverse_index(self):
+        """ A graph without the reverse index loads without it """
+        graph = WeightedDiGraph(6, self.EDGES, reverse_index=False)
+        loaded = self.round_trip(graph, True)
+
+        assert not loaded.has_reverse_index()
+        assert edge_tuples(loaded) == set(self.EDGES)
+
+    def test_vertex_ids_and_float_weights(self):
+        """ Vertex ids and float weights survive a round trip """
+        vertex_ids = [u"8220DB000002", u"8220DB000003", u"Sr\xe1id"]
+        graph = WeightedDiGraph(3, [(0, 1, 1.5), (2, 0, 0.25)],
+                                vertex_ids=vertex_ids)
+        for mmap in (True, False):
+            loaded = self.round_trip(graph, mmap)
+            assert loaded.vertex_ids == vertex_ids
+            assert edge_tuples(loaded) == set([(0, 1, 1.5), (2, 0, 0.25)])
+
+    @raises(ValueError)
+    def test_vertex_ids_must_be_strings(self):
+        """ Vertex ids that would not load as they were saved are
+            refused """
+        graph = WeightedDiGraph(3, [(0, 1, 1)], vertex_ids=[10, 20, 30])
+        storage.save(graph, self.filename)
+
+    def test_byte_string_vertex_ids(self):
+        """ Byte string vertex ids load as unicode """
+        graph = WeightedDiGraph(2, [(0, 1, 1)], vertex_ids=["a", "b"])
+        assert self.round_trip(graph, False).vertex_ids == [u"a", u"b"]
+
+    @raises(ValueError)
+    def test_mapped_graph_is_read_only(self):
+        """ A memory-mapped graph cannot be changed """
+        loaded = self.round_trip(WeightedDiGraph(6, self.EDGES), True)
+        loaded.update_edge_weight(0, 1, 3)
+
+    def test_copied_graph_can_change(self):
+        """ A copied graph can be changed """
+        loaded = self.round_trip(WeightedDiGraph(6, self.EDGES), False)
+        loaded.add_edge(0, 5, 3)
+        assert loaded.get_weight_of_edge(0, 5) == 3
+
+    def test_copied_by_default(self):
+        """ load copies the arrays unless asked to map them, so weights
+            keep their Python types """
+        storage.save(WeightedDiGraph(6, self.EDGES), self.filename)
+        loaded = storage.load(self.filename)
+
+        assert not loaded.read_only
+        assert type(loaded.get_weight_of_edge(1, 3)) is int
+
+    @raises(ValueError)
+    def test_not_a_graph_file(self):
+        """ Other files are rejected """
+        with open(self.filename, 'wb') as the_file:
+            the_file.write("stop_id,stop_name,stop_lat,stop_lon\n" * 4)
+        storage.load(self.filename)
@@ -0,0 +1,156 @@
+from nose.tools import raises
+from graphs.graphs import WeightedDiGraph
+from graphs.graphs import SearchContext
+from graphs.graphs import bellman_ford
+from graphs.graphs import create_path_from_graph
+from graphs.graphs import dijkstra_search
+from graphs.vectorized import bellman_ford_vectorized
+from graphs.vectorized import delta_stepping
+from graphs.vectorized import graph_from_arrays
+from graphs_tests import negative_weight_graph
+from contraction_tests import random_graph
+
+
+class TestBellmanFordVectorized(object):
+    """ Unit tests for vectorized.bellman_ford_vectorized """
+
+    def test_shortest_paths(self):
+        """ Shortest paths found in graph """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(5, edges)
+        root = 0
+        context = SearchContext(5)
+
+        assert bellman_ford_vectorized(graph, root, context)
+
+        assert str(create_path_from_graph(graph, root, 0, context)) == "cost: 0.0 path: (0,)"
+        assert str(create_path_from_graph(graph, root, 2, context)) == "cost: 6.0 path: (0, 1, 2)"
+        assert str(create_path_from_graph(graph, root, 3, context)) == "cost: 14.0 path: (0, 1, 3)"
+        assert str(create_path_from_graph(graph, root, 4, context)) == "cost: 11.0 path: (0, 1, 2, 4)"
+
+    def test_workspace(self):
+        """ Without a context the result goes to the vertex workspaces """
+        graph = WeightedDiGraph(3, [(0, 1, 2), (1, 2, -1)])
+
+        assert bellman_ford_vectorized(graph, 0)
+        assert str(create_path_from_graph(graph, 0, 2)) == "cost: 1.0 path: (0, 1, 2)"
+
+    def test_matches_bellman_ford(self):
+        """ Path costs agree with bellman_ford on graphs with
+            negative edges """
+        for seed in xrange(3):
+            graph = negative_weight_graph(seed, 40, 160)
+            expected = SearchContext(40)
+            assert bellman_ford(graph, 0, expected)
+            context = SearchContext(40)
+            assert bellman_ford_vectorized(graph, 0, context)
+            assert context.distances == expected.distances
+            for vertex_id in context.reached_vertices():
+                path = create_path_from_graph(graph, 0, vertex_id, context)
+                assert path.cost == expected.get_cost(vertex_id)
+
+    def test_negative_cycle(self):
+        """ A reachable negative cycle is reported, an unreachable
+            one is not """
+        edges = [
+            (0, 1, 1),
+            (1, 2, -2),
+            (2, 1, 1),
+            (3, 0, 1)
+            ]
+
+        graph = WeightedDiGraph(4, edges)
+        assert not bellman_ford_vectorized(graph, 0, SearchContext(4))
+
+        edges = [
+            (0, 1, 1),
+            (2, 3, -5),
+            (3, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(4, edges)
+        assert bellman_ford_vectorized(graph, 0, SearchContext(4))
+
+
+class TestDeltaStepping(object):
+    """ Unit tests for vectorized.delta_stepping """
+
+    def test_shortest_paths(self):
+        """ Shortest paths found in graph """
+        edges = [
+            (0, 1, 5),
+            (1, 4, 7),
+            (3, 2, 8),
+            (2, 4, 5),
+            (1, 3, 9),
+            (2, 1, 1),
+            (1, 2, 1)
+            ]
+
+        graph = WeightedDiGraph(6, edges)
+        context = delta_stepping(graph, 0, delta=3)
+
+        assert str(create_path_from_graph(graph, 0, 0, context)) == "cost: 0.0 path: (0,)"
+        assert str(create_path_from_graph(graph, 0, 3, context)) == "cost: 14.0 path: (0, 1, 3)"
+        assert str(create_path_from_graph(graph, 0, 4, context)) == "cost: 11.0 path: (0, 1, 2, 4)"
+        assert not context.is_reached(5)
+
+    def test_matches_dijikstra(self):
+        """ Path costs agree with dijikstra for several deltas """
+        graph = random_graph(4, 200, 900)
+        expected = dijkstra_search(graph, 0)
+        for delta in (None, 0.5, 3, 10, 100):
+            context = delta_stepping(graph, 0, delta=delta)
+            assert context.distances == expected.distances
+            for vertex_id in context.reached_vertices():
+                path = create_path_from_graph(graph, 0, vertex_id, context)
+                assert path.cost == expected.get_cost(vertex_id)
+
+    @raises(ValueError)
+    def test_negative_weights(self):
+        """ Negative weights are rejected """
+        delta_stepping(WeightedDiGraph(2, [(0, 1, -1)]), 0)
+
+
+class TestGraphFromArrays(object):
+    """ Unit tests for vectorized.graph_from_arrays """
+
+    def test_matches_constructor(self):
+        """ The adjacency matches the constructor's for distinct edges """
+        edges = [(0, 1, 5), (1, 4, 7), (3, 2, 8), (2, 4, 5), (1, 3, 9), (2, 1, 1)]
+        firsts, seconds, weights = zip(*edges)
+
+        graph = graph_from_arrays(5, firsts, seconds, weights)
+        expected = WeightedDiGraph(5, edges)
+
+        for structure in ("adjacency", "reverse_adjacency"):
+            built = getattr(graph, structure)
+            wanted = getattr(expected, structure)
+            assert built.offsets == wanted.offsets
+            assert built.targets == wanted.targets
+            assert built.weights == wanted.weights
+
+    def test_lowest_weight_kept(self):
+        """ A repeated edge keeps its lowest weight, and the graph can
+            still be changed """
+        graph = graph_from_arrays(3, [0, 0, 1, 0], [1, 1, 2, 1], [7, 3, 2, 5],
+                                  reverse_index=False)
+
+        assert graph.get_weight_of_edge(0, 1) == 3
+        assert graph.get_edge_count() == 2
+        graph.add_edge(2, 0, 1.5)
+        assert graph.get_weight_of_edge(2, 0) == 1.5
+
+    @raises(ValueError)
+    def test_bad_vertex(self):
+        """ Edges outside the vertex range are rejected """
+        graph_from_arrays(2, [0], [2], [1])